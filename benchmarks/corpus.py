@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Generates a synthetic MkDocs site with a configurable number and size of pages.
+The pages contain the usual markdown elements (headings, lists, links, inline code and code blocks).
+"""
+import argparse
+import os
+import random
+
+WORDS = """
+the documentation server build page plugin check spelling grammar language text paragraph section example
+configuration option value default file directory container request response result error warning user
+install update create remove start stop run test setting feature support version release change note
+quickly easily usually often always never simply correctly automatically manually carefully
+is are was can should will may must has have does uses needs contains shows explains describes
+""".split()
+
+
+def generate_sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), f"`{rng.choice(WORDS)}_{rng.choice(WORDS)}`")
+    if rng.random() < 0.1:
+        words.insert(rng.randrange(len(words)), f"[{rng.choice(WORDS)}](https://example.com/{rng.choice(WORDS)})")
+    return " ".join(words).capitalize() + "."
+
+
+def generate_page(rng: random.Random, index: int, words_per_page: int) -> str:
+    blocks = [f"# Page {index}"]
+    word_count = 0
+    while word_count < words_per_page:
+        kind = rng.random()
+        if kind < 0.1:
+            blocks.append(f"## {generate_sentence(rng)[:-1]}")
+        elif kind < 0.2:
+            blocks.append("\n".join(f"- {generate_sentence(rng)}" for _ in range(rng.randint(2, 5))))
+        elif kind < 0.3:
+            blocks.append("```python\n" + "\n".join(f"{rng.choice(WORDS)} = {rng.randint(0, 100)}" for _ in range(rng.randint(2, 8))) + "\n```")
+        else:
+            blocks.append(" ".join(generate_sentence(rng) for _ in range(rng.randint(2, 6))))
+        word_count += len(blocks[-1].split())
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_corpus(output_directory: str, page_count: int, words_per_page: int, seed: int = 0) -> list[str]:
+    """
+    Writes the pages to the docs directory of the site and returns their paths.
+    The same arguments always generate the same site.
+    """
+    rng = random.Random(seed)
+    docs_directory = os.path.join(output_directory, "docs")
+    os.makedirs(docs_directory, exist_ok=True)
+
+    paths = []
+    for index in range(page_count):
+        path = os.path.join(docs_directory, "index.md" if index == 0 else f"page-{index}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_page(rng, index, words_per_page))
+        paths.append(path)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("output_directory", help="the directory to create the site in")
+    ap.add_argument("-n", "--pages", type=int, default=100, help="number of pages (default: 100)")
+    ap.add_argument("-w", "--words", type=int, default=500, help="approximate number of words per page (default: 500)")
+    ap.add_argument("-s", "--seed", type=int, default=0, help="seed for the random generator (default: 0)")
+    args = ap.parse_args()
+
+    paths = generate_corpus(args.output_directory, args.pages, args.words, args.seed)
+    print(f"[*] Generated {len(paths)} pages in {args.output_directory}")
+
+
+if __name__ == "__main__":
+    main()
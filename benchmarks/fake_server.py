@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+A stand-in for a LanguageTool server, so that the plugin can be benchmarked without Java or a network connection.
+It answers /v2/check requests after a configurable delay and reports a configurable share of the words as spelling mistakes.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+WORD = re.compile(r"\w+")
+# Same as the real server, so that the context is built the same way
+CONTEXT_CHARACTERS = 40
+LANGUAGES = [{"name": "English (US)", "code": "en", "longCode": "en-US"}]
+
+
+class FakeLanguageToolServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str,int], latency: float, latency_per_kb: float, match_density: float, workers: int = 0, queue_limit: int = 0):
+        super().__init__(address, FakeLanguageToolHandler)
+        self.latency = latency
+        self.latency_per_kb = latency_per_kb
+        self.match_density = match_density
+        # Like the real server, only a limited number of requests is checked at the same time, the others have to wait
+        self.workers = threading.Semaphore(workers) if workers > 0 else None
+        self.queue_limit = queue_limit
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+
+class FakeLanguageToolHandler(BaseHTTPRequestHandler):
+    server: FakeLanguageToolServer
+    # Keep-alive connections, like the real server
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/languages"):
+            self.send_json(LANGUAGES)
+        else:
+            self.send_error(404)
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        if not self.path.rstrip("/").endswith("/check"):
+            self.send_error(404)
+            return
+
+        text = parse_qs(body).get("text", [""])[0]
+        delay = self.server.latency + self.server.latency_per_kb * len(text) / 1024
+        if self.server.workers:
+            with self.server.lock:
+                if self.server.queue_limit and self.server.waiting >= self.server.queue_limit:
+                    self.send_error(503, "Server overloaded")
+                    return
+                self.server.waiting += 1
+            with self.server.workers:
+                with self.server.lock:
+                    self.server.waiting -= 1
+                time.sleep(delay)
+        else:
+            time.sleep(delay)
+        self.send_json({
+            "software": {"name": "FakeLanguageTool", "version": "1.0"},
+            "matches": find_matches(text, self.server.match_density),
+        })
+
+    def send_json(self, data) -> None:
+        response = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+def find_matches(text: str, match_density: float) -> list[dict]:
+    # Seeded with the text, so that the same text always gets the same matches (like with the real server)
+    rng = random.Random(text)
+    matches = []
+    for word in WORD.finditer(text):
+        if rng.random() < match_density:
+            context_start = max(0, word.start() - CONTEXT_CHARACTERS)
+            context_end = min(len(text), word.end() + CONTEXT_CHARACTERS)
+            matches.append({
+                "message": "Possible spelling mistake found.",
+                "offset": word.start(),
+                "length": word.end() - word.start(),
+                "context": {
+                    "text": text[context_start:context_end].replace("\n", " "),
+                    "offset": word.start() - context_start,
+                    "length": word.end() - word.start(),
+                },
+                "rule": {"id": "MORFOLOGIK_RULE_EN_US", "category": {"id": "TYPOS"}},
+            })
+    return matches
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("-p", "--port", type=int, default=8081, help="the port to listen on (default: 8081)")
+    ap.add_argument("-l", "--latency", type=float, default=0.05, help="seconds to wait before answering a check request (default: 0.05)")
+    ap.add_argument("-k", "--latency-per-kb", type=float, default=0.01, help="additional seconds to wait per KiB of checked text (default: 0.01)")
+    ap.add_argument("-d", "--match-density", type=float, default=0.01, help="share of the words that are reported as mistakes (default: 0.01)")
+    ap.add_argument("-w", "--workers", type=int, default=0, help="how many requests are checked at the same time, 0 means unlimited (default: 0)")
+    ap.add_argument("-q", "--queue-limit", type=int, default=0, help="answer with 503 if this many requests are waiting for a worker, 0 means unlimited (default: 0)")
+    args = ap.parse_args()
+
+    server = FakeLanguageToolServer(("127.0.0.1", args.port), args.latency, args.latency_per_kb, args.match_density, args.workers, args.queue_limit)
+    print(f"[*] Listening on http://127.0.0.1:{args.port}/v2/check", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
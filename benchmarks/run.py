@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Measures how fast the plugin checks a synthetic site against the fake LanguageTool server.
+
+Each scenario runs in its own process, so that the peak memory usage of one scenario does not affect the others.
+Example: python benchmarks/run.py --pages 500 --latency 0.1 --scenarios sequential threads
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(BENCHMARK_DIRECTORY), "src")
+CLI_PATH = os.path.join(SOURCE_DIRECTORY, "languagetool-cli.py")
+SCENARIOS = ["sequential", "threads", "asyncio", "cli"]
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_server(args) -> tuple[subprocess.Popen, str]:
+    port = get_free_port()
+    process = subprocess.Popen([
+        sys.executable, os.path.join(BENCHMARK_DIRECTORY, "fake_server.py"), "--port", str(port),
+        "--latency", str(args.latency), "--latency-per-kb", str(args.latency_per_kb), "--match-density", str(args.match_density),
+        "--workers", str(args.server_workers), "--queue-limit", str(args.server_queue_limit),
+    ], stdout=subprocess.DEVNULL)
+
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/v2/languages", timeout=1)
+            return process, f"http://127.0.0.1:{port}/v2/check"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise Exception("The fake LanguageTool server did not start")
+
+
+def get_peak_rss_mb(who: int) -> float:
+    # Linux reports kilobytes, macOS reports bytes
+    max_rss = resource.getrusage(who).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def instrument_requests(latencies: list[float]) -> None:
+    """
+    Records the duration of every request sent by the blocking and the asyncio client
+    """
+    from mkdocs_languagetool_plugin.languagetool import LanguageToolClient
+    from mkdocs_languagetool_plugin import async_tasks
+
+    original_post = LanguageToolClient.post
+    def timed_post(self, *args, **kwargs):
+        start_time = time.monotonic()
+        try:
+            return original_post(self, *args, **kwargs)
+        finally:
+            latencies.append(time.monotonic() - start_time)
+    LanguageToolClient.post = timed_post
+
+    original_async_post = async_tasks.AsyncLanguageToolClient.post
+    async def timed_async_post(self, *args, **kwargs):
+        start_time = time.monotonic()
+        try:
+            return await original_async_post(self, *args, **kwargs)
+        finally:
+            latencies.append(time.monotonic() - start_time)
+    async_tasks.AsyncLanguageToolClient.post = timed_async_post
+
+
+def run_plugin_scenario(scenario: str, site_directory: str, url: str, args) -> list[float]:
+    sys.path.insert(0, SOURCE_DIRECTORY)
+    from mkdocs.structure.files import File
+    from mkdocs_languagetool_plugin.config import LanguageToolPluginConfig, create_languagetool_client
+    from mkdocs_languagetool_plugin.tasks import ParallelLanguageToolTasks, process_sequential_languagetool_tasks
+    from mkdocs_languagetool_plugin.async_tasks import AsyncLanguageToolTasks
+
+    latencies: list[float] = []
+    instrument_requests(latencies)
+
+    plugin_config = LanguageToolPluginConfig()
+    plugin_config.load_dict({
+        "languagetool_urls": [url],
+        "docker_create_container": False,
+        "print_errors": False,
+        "print_summary": False,
+        "async_threads": args.threads,
+        "asyncio_max_requests": args.threads,
+        "batch_max_characters": args.batch_max_characters,
+        "adaptive_concurrency": args.adaptive,
+    })
+    errors, _warnings = plugin_config.validate()
+    if errors:
+        raise Exception(f"Invalid plugin config: {errors}")
+
+    docs_directory = os.path.join(site_directory, "docs")
+    files = [File(name, docs_directory, os.path.join(site_directory, "site"), True) for name in sorted(os.listdir(docs_directory))]
+    client = create_languagetool_client(plugin_config)
+
+    if scenario == "sequential":
+        process_sequential_languagetool_tasks(files, plugin_config, client)
+    else:
+        tasks = AsyncLanguageToolTasks(plugin_config, client) if scenario == "asyncio" else ParallelLanguageToolTasks(plugin_config, client)
+        tasks.start_parallel(files, args.threads)
+        tasks.wait_for_parallel()
+    client.close()
+    return latencies
+
+
+def run_cli_scenario(site_directory: str, url: str, args) -> list[float]:
+    """
+    Runs the CLI in this process (with all pages at once), so that the requests can be measured like in the other scenarios
+    """
+    sys.path.insert(0, SOURCE_DIRECTORY)
+    latencies: list[float] = []
+    instrument_requests(latencies)
+
+    spec = importlib.util.spec_from_file_location("languagetool_cli", CLI_PATH)
+    cli = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cli)
+
+    sys.argv = [CLI_PATH, "--url", url, "--markdown", "--statistics", "--jobs", str(args.threads), os.path.join(site_directory, "docs")]
+    # The CLI exits with the number of errors
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):
+        cli.main()
+    return latencies
+
+
+def run_scenario(scenario: str, site_directory: str, url: str, args) -> dict:
+    """
+    Runs a single scenario in the current process and returns the measurements
+    """
+    page_count = len(os.listdir(os.path.join(site_directory, "docs")))
+    start_time = time.monotonic()
+    if scenario == "cli":
+        latencies = run_cli_scenario(site_directory, url, args)
+    else:
+        latencies = run_plugin_scenario(scenario, site_directory, url, args)
+    duration = time.monotonic() - start_time
+    peak_rss = get_peak_rss_mb(resource.RUSAGE_SELF)
+
+    return {
+        "scenario": scenario,
+        "pages": page_count,
+        "seconds": duration,
+        "pages_per_second": page_count / duration,
+        "requests": len(latencies),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p99": percentile(latencies, 99),
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-s", "--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS, help="the scenarios to run (default: all)")
+    ap.add_argument("-n", "--pages", type=int, default=200, help="number of pages in the generated site (default: 200)")
+    ap.add_argument("-w", "--words", type=int, default=500, help="approximate number of words per page (default: 500)")
+    ap.add_argument("-t", "--threads", type=int, default=4, help="'async_threads' and 'asyncio_max_requests' to use (default: 4)")
+    ap.add_argument("-b", "--batch-max-characters", type=int, default=0, help="'batch_max_characters' to use (default: 0)")
+    ap.add_argument("-l", "--latency", type=float, default=0.05, help="seconds the fake server waits before answering a request (default: 0.05)")
+    ap.add_argument("-k", "--latency-per-kb", type=float, default=0.01, help="additional seconds the fake server waits per KiB of text (default: 0.01)")
+    ap.add_argument("-d", "--match-density", type=float, default=0.01, help="share of the words that the fake server reports (default: 0.01)")
+    ap.add_argument("--server-workers", type=int, default=0, help="how many requests the fake server checks at the same time, 0 means unlimited (default: 0)")
+    ap.add_argument("--server-queue-limit", type=int, default=0, help="the fake server answers with 503 if this many requests are waiting, 0 means unlimited (default: 0)")
+    ap.add_argument("-a", "--adaptive", action="store_true", help="enable 'adaptive_concurrency'")
+    ap.add_argument("-j", "--json", help="also write the results to this file (as JSON)")
+    # Used internally to run each scenario in a fresh process
+    ap.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    ap.add_argument("--site", help=argparse.SUPPRESS)
+    ap.add_argument("--url", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(args.run_scenario, args.site, args.url, args)))
+        return
+
+    sys.path.insert(0, BENCHMARK_DIRECTORY)
+    from corpus import generate_corpus
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="languagetool-benchmark-") as site_directory:
+        generate_corpus(site_directory, args.pages, args.words)
+        server, url = start_fake_server(args)
+        try:
+            print(f"{'scenario':<12} {'pages/s':>9} {'seconds':>9} {'requests':>9} {'p50 [ms]':>9} {'p99 [ms]':>9} {'RSS [MB]':>9}")
+            for scenario in args.scenarios:
+                output = subprocess.run([
+                    sys.executable, os.path.abspath(__file__), "--run-scenario", scenario, "--site", site_directory, "--url", url,
+                    "--threads", str(args.threads), "--batch-max-characters", str(args.batch_max_characters), *(["--adaptive"] if args.adaptive else []),
+                ], stdout=subprocess.PIPE, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                results.append(result)
+                print(f"{scenario:<12} {result['pages_per_second']:>9.1f} {result['seconds']:>9.2f} {result['requests']:>9} {result['latency_p50'] * 1000:>9.1f} {result['latency_p99'] * 1000:>9.1f} {result['peak_rss_mb']:>9.1f}")
+        finally:
+            server.kill()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"arguments": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
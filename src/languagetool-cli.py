@@ -1,9 +1,19 @@
 #!/usr/bin/env python3
 
 import argparse
+import concurrent.futures
+import fnmatch
+import glob
+import os
 import sys
+from typing import Optional
 # local
-from mkdocs_languagetool_plugin.languagetool import spellcheck_text, LanguageToolResultEntry
+from mkdocs_languagetool_plugin.languagetool import LanguageToolClient, LanguageToolError, parse_language_tool_match, get_server_version, LanguageToolResultEntry
+from mkdocs_languagetool_plugin.prose import extract_prose
+from mkdocs_languagetool_plugin.incremental import request_matches_chunked
+from mkdocs_languagetool_plugin.cache import ResultCache
+from mkdocs_languagetool_plugin.known_words import KnownWords
+from mkdocs_languagetool_plugin.tasks import FileBatchCheck
 
 HIGHLIGHT_COLOR = "\033[0;31m"
 HIGHLIGHT_RESET = "\033[0m"
@@ -13,8 +23,8 @@ def print_colored_function(text: str, errors: list[LanguageToolResultEntry]) ->
     colored_text = text
     # Iterate over reversed results to keep the indexes correct
     for error in reversed(errors):
-        error_start = error.raw_dict["offset"]
-        error_end = error_start + error.raw_dict["length"]
+        error_start = error.offset
+        error_end = error_start + error.length
         colored_text = colored_text[:error_start] + HIGHLIGHT_COLOR + error.misspelled_string + HIGHLIGHT_RESET + colored_text[error_end:]
     
     print(colored_text)
@@ -28,15 +38,15 @@ def print_errors_function(text: str, errors: list[LanguageToolResultEntry]) -> N
         print(f"Line {line_range} | {error.rule_id} | {error.context_colored}")
 
 
-def print_statistics_function(text: str, errors: list[LanguageToolResultEntry]) -> None:
-    rule_id_counters: dict[str,int] = {}
-
+def count_errors_by_rule(rule_id_counters: dict[str,int], errors: list[LanguageToolResultEntry]) -> None:
     for error in errors:
         if error.rule_id in rule_id_counters:
             rule_id_counters[error.rule_id] += 1
         else:
             rule_id_counters[error.rule_id] = 1
 
+
+def print_statistics_function(rule_id_counters: dict[str,int]) -> None:
     print("[*] Error count by rule:\n" + format_counters(rule_id_counters))
 
 
@@ -50,11 +60,70 @@ def format_counters(counters: dict[str,int]) -> str:
     ])
 
 
+def find_files(paths: list[str], extensions: list[str], ignore_patterns: list[str]) -> list[str]:
+    """
+    Expands directories (recursively, only files with one of the extensions) and glob patterns into a list of files
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, names in os.walk(path):
+                subdirectories.sort()
+                files += [os.path.join(directory, name) for name in sorted(names) if name.endswith(tuple(extensions))]
+        elif any(character in path for character in "*?["):
+            files += sorted(glob.glob(path, recursive=True))
+        else:
+            files.append(path)
+
+    # Remove duplicates, but keep the order
+    files = list(dict.fromkeys(os.path.normpath(file) for file in files))
+    return [file for file in files if not any(fnmatch.fnmatch(file, pattern) for pattern in ignore_patterns)]
+
+
+def check_file(path: str, client: LanguageToolClient, args, custom_request_options: dict, cache: Optional[ResultCache]) -> list[LanguageToolResultEntry]:
+    check = FileBatchCheck([path], args.language, custom_request_options, cache, args.markdown)
+    matches = request_matches_chunked(check.request_text, client, args.language, custom_request_options, args.max_request_characters) if check.request_text is not None else []
+    return check.finish(matches)[0]
+
+
+def check_text(text: str, client: LanguageToolClient, args, custom_request_options: dict) -> list[LanguageToolResultEntry]:
+    prose = extract_prose(text) if args.markdown else None
+    matches = request_matches_chunked(prose.text if prose else text, client, args.language, custom_request_options, args.max_request_characters)
+    if prose:
+        matches = [prose.remap_match(match) for match in matches]
+    return [parse_language_tool_match(match, text, language=args.language) for match in matches]
+
+
+def print_file_results(name: str, text: str, errors: list[LanguageToolResultEntry], show_name: bool, print_colors: bool, print_errors: bool) -> None:
+    if show_name and (print_colors or print_errors):
+        print(f"[*] {name}")
+    if print_colors:
+        print_colored_function(text, errors)
+    if print_errors:
+        print_errors_function(text, errors)
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("file", nargs="?", help="the file to spellcheck (default: read from stdin)")
+    ap.add_argument("files", nargs="*", help="the files, directories or glob patterns to spellcheck (default: read from stdin)")
     ap.add_argument("-u", "--url", default="http://localhost:8081/v2/check", help="the URL of the language tool server (default: http://localhost:8081/v2/check)")
+    ap.add_argument("-t", "--timeout", type=float, default=60, help="seconds to wait for the server to respond (default: 60)")
+    ap.add_argument("-r", "--retries", type=int, default=3, help="how often failed requests are retried (default: 3)")
     ap.add_argument("-l", "--language", default="en-US", help="the language of the text (default: en-US)")
+    ap.add_argument("-m", "--markdown", action="store_true", help="only check the prose of a markdown document (ignore code blocks, URLs, etc)")
+    ap.add_argument("-j", "--jobs", type=int, default=4, help="how many files to check at the same time (default: 4)")
+    ap.add_argument("--extension", action="append", help="file extension to check in directories, can be used multiple times (default: .md)")
+    ap.add_argument("--max-request-characters", type=int, default=50000, help="longer texts are split at paragraphs and sent in multiple requests (default: 50000)")
+    filter_group = ap.add_argument_group("Filters")
+    filter_group.add_argument("--ignore-file", action="append", default=[], help="glob pattern for files to skip, can be used multiple times")
+    filter_group.add_argument("--ignore-rule", action="append", default=[], help="LanguageTool rule to disable, can be used multiple times")
+    filter_group.add_argument("--known-word", action="append", default=[], help="word to not report as a spelling mistake, can be used multiple times")
+    filter_group.add_argument("--known-words-file", action="append", default=[], help="file with one known word per line, can be used multiple times")
+    filter_group.add_argument("--ignore-pattern", action="append", default=[], help="regular expression for words to not report as spelling mistakes, can be used multiple times")
+    cache_group = ap.add_argument_group("Cache")
+    cache_group.add_argument("--cache-directory", help="store results in this directory, so that unchanged files are not checked again")
+    cache_group.add_argument("--cache-max-entries", type=int, default=10000, help="maximum number of cached results (default: 10000)")
+    cache_group.add_argument("--cache-paragraphs", action="store_true", help="also cache the results per paragraph")
     action_group = ap.add_argument_group("Actions")
     action_group.add_argument("-c", "--color", action="store_true", help="print the text with errors highlighted in color")
     action_group.add_argument("-e", "--errors", action="store_true", help="show errors descriptions")
@@ -62,33 +131,79 @@ def main():
 
     args = ap.parse_args()
 
-    if args.file:
-        try:
-            with open(args.file) as f:
-                text = f.read()
-        except Exception as ex:
-            print(f"[!] Failed to read file {args.file}: {ex}")
-    else:
-        text = sys.stdin.read()
+    read_stdin = not args.files or args.files == ["-"]
+    files = [] if read_stdin else find_files(args.files, args.extension or [".md"], args.ignore_file)
+    show_names = len(files) > 1
 
     print_colors = args.color
     print_errors = args.errors
     print_statistics = args.statistics
     # Default to one action if none are supplied
     if not print_colors and not print_errors and not print_statistics:
-        print_colors = True
-
-    errors = spellcheck_text(text, args.url, args.language, {})
+        # Printing the whole text of many files is not helpful
+        print_colors = not show_names
+        print_errors = show_names
+
+    client = LanguageToolClient([args.url], pool_size=max(args.jobs, 1), read_timeout=args.timeout, max_retries=args.retries)
+    custom_request_options = {"disabledRules": ",".join(args.ignore_rule)} if args.ignore_rule else {}
+    known_words = None
+    if args.known_word or args.known_words_file or args.ignore_pattern:
+        known_words = KnownWords(args.known_word, {"*": args.ignore_pattern})
+        for path in args.known_words_file:
+            known_words.load_file(path)
+
+    # Only the counts are kept, so that the memory usage does not grow with the number of files
+    rule_id_counters: dict[str,int] = {}
+    error_count = 0
+    failed_count = 0
+    if read_stdin:
+        text = sys.stdin.read()
+        errors = check_text(text, client, args, custom_request_options)
+        if known_words:
+            errors = known_words.filter("-", errors)
+        print_file_results("-", text, errors, False, print_colors, print_errors)
+        count_errors_by_rule(rule_id_counters, errors)
+        error_count += len(errors)
+    else:
+        cache = None
+        if args.cache_directory:
+            # The server version is part of the key, but it is only requested if a file needs to be checked
+            cache = ResultCache(args.cache_directory, args.cache_max_entries, lambda: get_server_version(client), args.cache_paragraphs)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as executor:
+            future_to_file = {executor.submit(check_file, path, client, args, custom_request_options, cache): path for path in files}
+            # Print the results of each file as soon as it is checked
+            for future in concurrent.futures.as_completed(future_to_file):
+                path = future_to_file[future]
+                try:
+                    errors = future.result()
+                except (OSError, UnicodeDecodeError) as ex:
+                    print(f"[!] Failed to read file {path}: {ex}")
+                    failed_count += 1
+                    continue
+                except LanguageToolError as ex:
+                    print(f"[!] Failed to check file {path}: {ex}")
+                    failed_count += 1
+                    continue
+
+                if known_words:
+                    errors = known_words.filter(path, errors)
+                text = ""
+                if print_colors:
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                print_file_results(path, text, errors, show_names, print_colors, print_errors)
+                count_errors_by_rule(rule_id_counters, errors)
+                error_count += len(errors)
+
+        if cache:
+            cache.evict()
+    client.close()
 
-    if print_colors:
-        print_colored_function(text, errors)
-    if print_errors:
-        print_errors_function(text, errors)
     if print_statistics:
-        print_statistics_function(text, errors)
+        print_statistics_function(rule_id_counters)
 
-    error_count = min(len(errors), 128)
-    exit(error_count)
+    exit(min(error_count + failed_count, 128))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import Optional
+# pip
+from mkdocs.exceptions import PluginError
+from mkdocs.structure.files import File
+# local
+from .languagetool import LanguageToolClient, LanguageToolError, LanguageToolResultEntry, RETRY_STATUS_CODES, MAX_RETRY_DELAY, create_check_request
+from .tasks import ParallelLanguageToolTasks, FileBatchCheck, create_language_batches, format_batch, sort_largest_first
+from .profiling import Profiler
+from .utils import LOGGER
+
+try:
+    # pip install aiohttp
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncLanguageToolClient:
+    """
+    The asyncio counterpart of LanguageToolClient. It uses the same servers, timeouts and retry settings.
+    Use it as an async context manager, so that the connections are closed afterwards.
+    """
+    def __init__(self, client: LanguageToolClient, max_connections: int):
+        self.endpoints = client.endpoints
+        self.timeout = aiohttp.ClientTimeout(sock_connect=client.timeout[0], sock_read=client.timeout[1])
+        self.max_retries = client.max_retries
+        self.retry_backoff = client.retry_backoff
+        self.max_connections = max_connections
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def request_matches(self, text: str, language: str, custom_request_options: dict) -> list[dict]:
+        response = await self.post(create_check_request(text, language, custom_request_options))
+        return response.get("matches", [])
+
+    async def post(self, data: dict) -> dict:
+        """
+        Sends a check request and returns the parsed JSON response.
+        Connection errors, timeouts and temporary server errors are retried with an exponential backoff.
+        """
+        attempt = 0
+        while True:
+            endpoint = self.endpoints.acquire()
+            healthy = False
+            try:
+                async with self.session.post(endpoint.url, data=data) as response:
+                    if response.status == 200:
+                        result = await response.json()
+                        healthy = True
+                        return result
+                    error = LanguageToolError(f"LanguageTool server at {endpoint.url} returned unexpected status code {response.status}: {await response.text()}")
+                    retryable = response.status in RETRY_STATUS_CODES
+                    healthy = not retryable
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as ex:
+                error = LanguageToolError(f"Error connecting to language tool server {endpoint.url}: [{type(ex).__name__}] {ex}")
+                retryable = True
+            except Exception as ex:
+                raise LanguageToolError(f"Error connecting to language tool server {endpoint.url}: [{type(ex).__name__}] {ex}")
+            finally:
+                self.endpoints.release(endpoint, healthy)
+
+            if not retryable or attempt >= self.max_retries:
+                raise error
+
+            if not self.endpoints.has_healthy_endpoint():
+                delay = min(self.retry_backoff * (2 ** attempt), MAX_RETRY_DELAY)
+                LOGGER.debug(f"Retrying request in {delay} seconds after error: {error}")
+                await asyncio.sleep(delay)
+            attempt += 1
+
+
+class AsyncLanguageToolTasks(ParallelLanguageToolTasks):
+    """
+    Like ParallelLanguageToolTasks, but the requests are sent from an asyncio event loop (running in a background thread).
+    This allows hundreds of requests to be in flight at the same time, without needing one thread per request.
+    """
+    def __init__(self, plugin_config, client: LanguageToolClient, profiler: Optional[Profiler] = None):
+        if aiohttp is None:
+            raise PluginError("The 'asyncio' check_engine requires the 'aiohttp' package. Install it with 'pip install mkdocs-languagetool-plugin[async]'")
+
+        super().__init__(plugin_config, client, profiler)
+        self.thread: Optional[threading.Thread] = None
+        self.html_pages: Optional[dict[str,str]] = None
+
+    def start_parallel(self, file_list: list[File], max_parallel_tasks: int, html_pages: Optional[dict[str,str]] = None):
+        self.html_pages = html_pages
+        LOGGER.info(f"Starting asyncio spell checking with up to {max_parallel_tasks} parallel requests")
+        self.start_time = time.monotonic()
+        # Normal futures are used to pass the results to the other threads, so that the result handling works unchanged
+        for batch in create_language_batches(sort_largest_first(file_list), self.plugin_config.batch_max_characters, self.languages):
+            self.add_task(concurrent.futures.Future(), batch)
+        self.thread = threading.Thread(target=asyncio.run, args=(self.check_all(max_parallel_tasks),), daemon=True)
+        self.thread.start()
+
+    def wait_for_tasks(self) -> None:
+        # The done callbacks (that report the results) run in the event loop thread, so all results are reported once it ended
+        if self.thread:
+            self.thread.join()
+
+    async def check_all(self, max_parallel_tasks: int) -> None:
+        semaphore = asyncio.Semaphore(max_parallel_tasks)
+        async with AsyncLanguageToolClient(self.client, max_parallel_tasks) as async_client:
+            await asyncio.gather(*[
+                self.check_batch(future, batch, async_client, semaphore)
+                for future, batch in self.future_to_task.items()
+            ])
+
+    async def check_batch(self, future: concurrent.futures.Future, batch: list[File], async_client: AsyncLanguageToolClient, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            if not future.set_running_or_notify_cancel():
+                # The task was cancelled, since another task failed
+                return
+
+            page = format_batch(batch)
+            loop = asyncio.get_running_loop()
+            try:
+                # Preparing and finishing a check reads and writes files, parses HTML and may ask the server for its version (see ResultCache).
+                # This blocks, so it runs in the default executor, while the event loop keeps sending the other requests
+                language, check = await loop.run_in_executor(None, self.prepare_check, batch, page)
+                matches = []
+                if check.request_text is not None:
+                    matches = await self.request_matches(check.request_text, language, async_client, page)
+                foreign_matches = {}
+                for chunk_language, request in check.foreign_requests.items():
+                    foreign_matches[chunk_language] = await self.request_matches(request.text, chunk_language, async_client, page)
+                results = await loop.run_in_executor(None, self.finish_check, check, matches, foreign_matches, page)
+                self.profiler.add_page_stats(page, matches=sum(len(file_results) for file_results in results))
+                future.set_result(results)
+            except Exception as ex:
+                future.set_exception(ex)
+
+    def prepare_check(self, batch: list[File], page: str) -> tuple[str, FileBatchCheck]:
+        # The requests overlap, so each page gets its own row in the trace
+        with self.profiler.phase("prepare", page, track=page):
+            language = self.languages.get_language(batch[0])
+            batch_html_pages = [self.html_pages[file.src_uri] for file in batch] if self.html_pages else None
+            check = FileBatchCheck([file.abs_src_path for file in batch], language, self.custom_request_options, self.cache, self.plugin_config.strip_markdown, self.plugin_config.keep_raw_matches, batch_html_pages, self.languages.detector)
+        return language, check
+
+    def finish_check(self, check: FileBatchCheck, matches: list[dict], foreign_matches: dict[str,list[dict]], page: str) -> list[list[LanguageToolResultEntry]]:
+        with self.profiler.phase("parse", page, track=page):
+            return check.finish(matches, foreign_matches)
+
+    async def request_matches(self, text: str, language: str, async_client: AsyncLanguageToolClient, page: str) -> list[dict]:
+        # This includes decoding the JSON response
+        with self.profiler.phase("request", page, track=page):
+            matches = await async_client.request_matches(text, language, self.custom_request_options)
+        self.profiler.add_page_stats(page, bytes_sent=len(text.encode("utf-8")))
+        return matches
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Optional
+# local
+from .languagetool import LanguageToolClient, LanguageToolResultEntry, get_server_version
+from .config import LanguageToolPluginConfig
+from .utils import LOGGER
+
+# Increase this when the format of the cached entries changes, so that old entries are not used anymore
+CACHE_FORMAT_VERSION = 3
+# Stores the version of the server, that the cached results were created with. It is not a '.json' file, so that it is never evicted
+SERVER_VERSION_FILE = "server_version.txt"
+
+
+class ResultCache:
+    """
+    On-disk cache that stores the parsed results of a spell check.
+    The entries are addressed by a hash of the checked text and all settings that influence the result.
+
+    Results may change between LanguageTool versions, so the server version is part of the path of each entry. It is only requested
+    from the server (with load_server_version), when a request needs to be sent anyways. So a build where all results are cached
+    does not need the server. Until then the version from the previous build is used.
+    """
+    def __init__(self, directory: str, max_entries: int, load_server_version: Callable[[], str], cache_paragraphs: bool = False):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.load_server_version = load_server_version
+        self.cache_paragraphs = cache_paragraphs
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+        self.version_lock = threading.Lock()
+        self.server_version_checked = False
+        self.server_version = self.read_server_version()
+        if self.server_version is None:
+            # Nothing was cached so far, so the server will be needed anyways
+            self.check_server_version()
+
+    def read_server_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, SERVER_VERSION_FILE), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def check_server_version(self) -> None:
+        """
+        Asks the server for its version (once). If it changed, the new version is used for the keys from now on
+        """
+        with self.version_lock:
+            if self.server_version_checked:
+                return
+            self.server_version_checked = True
+            server_version = self.load_server_version()
+            if server_version == self.server_version:
+                return
+
+            if self.server_version is not None:
+                LOGGER.info(f"LanguageTool server version changed from '{self.server_version}' to '{server_version}', cached results are not used anymore")
+            self.server_version = server_version
+            try:
+                with open(os.path.join(self.directory, SERVER_VERSION_FILE), "w", encoding="utf-8") as f:
+                    f.write(server_version + "\n")
+            except OSError as ex:
+                LOGGER.warning(f"Failed to store the server version in the cache: {ex}")
+
+    def get_key(self, text: str, language: str, custom_request_options: dict, kind: str = "file") -> str:
+        # The server version is added in get_path, since it may change after the keys were created (see check_server_version)
+        key_material = json.dumps([CACHE_FORMAT_VERSION, kind, language, custom_request_options, text], sort_keys=True)
+        return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[list[LanguageToolResultEntry]]:
+        entries = self.load(key)
+        if entries is None:
+            return None
+        return [LanguageToolResultEntry(**entry) for entry in entries]
+
+    def put(self, key: str, results: list[LanguageToolResultEntry]) -> None:
+        self.store(key, [entry._asdict() for entry in results])
+
+    def get_matches(self, key: str) -> Optional[list[dict]]:
+        """
+        Returns the unparsed matches stored for a text fragment (see incremental.py)
+        """
+        return self.load(key)
+
+    def put_matches(self, key: str, matches: list[dict]) -> None:
+        self.store(key, matches)
+
+    def load(self, key: str) -> Optional[list]:
+        value = self.read_entry(key)
+        if value is None:
+            server_version = self.server_version
+            # The text will be sent to the server, so this is a cheap moment to check whether the server was updated
+            self.check_server_version()
+            if self.server_version != server_version:
+                # The key now belongs to another entry, which may have been stored by an earlier build with the new server
+                value = self.read_entry(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def read_entry(self, key: str) -> Optional[list]:
+        path = self.get_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            # Mark the entry as recently used, so that it will not be evicted soon
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as ex:
+            LOGGER.warning(f"Ignoring unreadable cache entry {path}: {ex}")
+            return None
+
+    def store(self, key: str, value: list) -> None:
+        path = self.get_path(key)
+        # Write to a temporary file first, so that parallel threads / builds never see half written entries
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(temp_path, path)
+        except OSError as ex:
+            LOGGER.warning(f"Failed to write cache entry {path}: {ex}")
+
+    def get_path(self, key: str) -> str:
+        name = hashlib.sha256(f"{self.server_version}\0{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until at most max_entries remain
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+
+        if len(entries) > self.max_entries:
+            entries.sort()
+            for _, path in entries[:len(entries) - self.max_entries]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        LOGGER.debug(f"Result cache: {self.hits} hit(s), {self.misses} miss(es)")
+
+
+def create_result_cache(plugin_config: LanguageToolPluginConfig, client: LanguageToolClient) -> Optional[ResultCache]:
+    if not plugin_config.cache_directory:
+        return None
+
+    return ResultCache(plugin_config.cache_directory, plugin_config.cache_max_entries, lambda: get_server_version(client), plugin_config.cache_paragraphs)
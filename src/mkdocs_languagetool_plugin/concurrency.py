@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+# local
+from .utils import LOGGER
+
+# A request is considered slowed down by queueing on the server, if it takes this many times longer (per KiB) than the fastest request
+LATENCY_TOLERANCE = 3
+# Requests smaller than this are assumed to take as long as a request of this size (in characters), since the overhead dominates
+MIN_NORMALIZED_SIZE = 1024
+
+T = TypeVar("T")
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Limits the number of requests that are sent at the same time and adjusts the limit like TCP congestion control (AIMD):
+    - While the server answers quickly, the limit grows: doubling every round trip at first (slow start), later by one per round trip
+    - When the server is overloaded (429/503 responses, timeouts or a much higher latency than before), the limit is halved
+    """
+    def __init__(self, maximum: int, initial: int = 1):
+        self.maximum = max(maximum, 1)
+        self.limit = float(min(max(initial, 1), self.maximum))
+        self.in_flight = 0
+        self.slow_start = True
+        # The fastest observed latency per KiB, which is assumed to be the latency without any queueing
+        self.min_latency_per_kb = float("inf")
+        self.last_latency = 0.0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def run(self, request: Callable[[], T], size: int) -> T:
+        """
+        Sends the request (of size characters) once the limit allows it
+        """
+        self.acquire()
+        start_time = time.monotonic()
+        latency = None
+        try:
+            result = request()
+            latency = time.monotonic() - start_time
+            return result
+        finally:
+            self.release(latency, size)
+
+    def acquire(self) -> None:
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: Optional[float], size: int = 0) -> None:
+        """
+        Called after a request of size characters finished. The latency is None if the request failed
+        """
+        with self.condition:
+            was_limited = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            if latency is None:
+                self.condition.notify_all()
+                return
+
+            self.last_latency = latency
+            latency_per_kb = latency / (max(size, MIN_NORMALIZED_SIZE) / 1024)
+            self.min_latency_per_kb = min(self.min_latency_per_kb, latency_per_kb)
+            if latency_per_kb > self.min_latency_per_kb * LATENCY_TOLERANCE:
+                self.decrease(f"latency increased to {latency:.2f} seconds")
+            elif was_limited:
+                # Only grow, if the current limit was actually reached. Otherwise it is unknown whether the server could handle more
+                self.limit = min(self.maximum, self.limit + (1 if self.slow_start else 1 / self.limit))
+
+            self.condition.notify_all()
+
+    def on_overload(self) -> None:
+        """
+        Called when the server signals, that it is overloaded
+        """
+        with self.condition:
+            self.decrease("server is overloaded")
+
+    def decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        # The requests that were sent at the same time all observe the same overload, so it is only handled once per round trip
+        if now - self.last_decrease < self.last_latency:
+            return
+
+        self.last_decrease = now
+        self.slow_start = False
+        self.limit = max(1.0, self.limit / 2)
+        LOGGER.debug(f"Reducing the number of parallel requests to {int(self.limit)}: {reason}")
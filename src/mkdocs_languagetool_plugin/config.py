@@ -1,5 +1,9 @@
-from mkdocs.config.config_options import Type, ListOfItems
+from typing import Optional
+# pip
+from mkdocs.config.config_options import Choice, Type, ListOfItems
 from mkdocs.config.base import Config
+# local
+from .languagetool import LanguageToolClient
 
 MY_DOCKER_IMAGE = "ghcr.io/six-two/languagetool"
 
@@ -16,29 +20,120 @@ class LanguageToolPluginConfig(Config):
     # Protocol to use (http for localhost)
     languagetool_protocol = Type(str, default="http")
 
+    # Full URLs (like http://10.0.0.2:8081/v2/check) of multiple LanguageTool servers to distribute the requests across.
+    # If this is set, the host, port and protocol settings are ignored
+    languagetool_urls = ListOfItems(Type(str), default=[])
+
     # The language to use for spell checking
     language = Type(str, default="en-US")
 
+    # Maps file patterns (like 'de/*' or '*.de.md') to the language of these files. Pages can also set their language with
+    # a 'lang' key in the front matter and the locale set by i18n plugins is used too. Pages are only batched with pages of the same language
+    language_per_file = Type(dict, default={})
+    # Maps short language codes (like 'de') to the variant that is checked (like 'de-DE'), since spell checking needs a variant
+    language_variants = Type(dict, default={})
+
+    # Detect the language of each paragraph (on the client side). Paragraphs in one of these languages are checked with this language
+    # instead of the language of the page. Supported are: de, en, es, fr, it, nl, pt
+    detect_languages = ListOfItems(Type(str), default=[])
+
+    # Timeouts (in seconds) for connecting to the server and for waiting for a response
+    languagetool_connect_timeout = Type((int, float), default=5)
+    languagetool_read_timeout = Type((int, float), default=60)
+
+    # How often a request is retried, when the server is not reachable or is overloaded. The delay between retries doubles every time
+    languagetool_max_retries = Type(int, default=3)
+    languagetool_retry_backoff = Type((int, float), default=0.5)
+
+    # Send some text to the server(s) before the real checking starts, so that the language is already loaded.
+    # If 'warmup_text' is empty, a built-in English text is used
+    warmup = Type(bool, default=False)
+    warmup_text = Type(str, default="")
+
     # Whether to print a summary of results
     print_summary = Type(bool, default=False)
 
     # Whether to print individual results (spelling errors)
     print_errors = Type(bool, default=True)
 
+    # Measure how long each phase of the spell checking takes and print the slowest pages at the end of the build
+    profile = Type(bool, default=False)
+    profile_top_pages = Type(int, default=10)
+    # Write the measured phases to this file in the Chrome trace event format (implies 'profile')
+    profile_trace_file = Type(str, default="")
+
+    # Keep the complete match returned by the server for every result (raw_dict). This needs a lot of memory on big sites
+    keep_raw_matches = Type(bool, default=False)
+
     # When this is >= 0, the spell checking is done in the background usinx X threads
     async_threads = Type(int, default=10)
 
+    # Adjust the number of parallel requests (up to 'async_threads') to how fast the server answers.
+    # It is reduced when the server gets slower or reports that it is overloaded. Only used by the 'threads' check_engine
+    adaptive_concurrency = Type(bool, default=False)
+
+    # How to run the background checks: 'threads' uses 'async_threads' threads.
+    # 'asyncio' sends up to 'asyncio_max_requests' requests at once from a single thread (requires the aiohttp package)
+    check_engine = Choice(["threads", "asyncio"], default="threads")
+    asyncio_max_requests = Type(int, default=100)
+
     # This prevents generating hundreds of errors (one per page) when there is a general issue with language tool.
     # Set it to 0 to never exit regardless of how many errors occur
     exit_on_error = Type(bool, default=True)
 
+    # Small pages are combined into requests with up to this many characters, which reduces the overhead per page.
+    # Set it to 0 to send one request per page
+    batch_max_characters = Type(int, default=0)
+
     # Ignore these files and spelling rules
     ignore_rules = ListOfItems(Type(str), default=[])
     ignore_files = ListOfItems(Type(str), default=[])
 
+    # Spelling mistakes for these words are not reported. The words are checked by the plugin, so they work with any server.
+    # Lower case words match regardless of the case, other words only match exactly
+    known_words = ListOfItems(Type(str), default=[])
+    # Files with one known word per line
+    known_words_files = ListOfItems(Type(str), default=[])
+    # Maps file patterns (like 'api/*.md') to regular expressions. Spelling mistakes in matching files are ignored, if the whole word matches one of them
+    ignore_patterns_per_file = Type(dict, default={})
+
     # Output unknown words to this file (make it easier to create a known words file)
     write_unknown_words_to_file = Type(str, default="")
 
+    # Write all results to this file, one JSON object per line. The file is written while the pages are checked
+    report_jsonl_file = Type(str, default="")
+
+    # Write all results to this file in the SARIF format, which is understood by many CI systems (for example GitHub code scanning)
+    report_sarif_file = Type(str, default="")
+
+    # Write a JUnit XML report with one test case per page to this file
+    report_junit_file = Type(str, default="")
+
+    # Suggestions listed in this file (in the 'report_jsonl_file' format) are known and not reported again.
+    # With 'update_baseline' the file is instead overwritten with all current suggestions
+    baseline_file = Type(str, default="")
+    update_baseline = Type(bool, default=False)
+
+    # Fail the build if there are any suggestions (if a baseline is used: any new suggestions)
+    fail_on_suggestions = Type(bool, default=False)
+
+    # Directory to store the results of previous spell checks in. Unchanged pages will not be sent to the server again.
+    # Leave it empty to disable caching
+    cache_directory = Type(str, default="")
+
+    # The least recently used entries are removed from the cache, when it contains more entries than this
+    cache_max_entries = Type(int, default=10000)
+
+    # Also cache the results for each paragraph, so that only changed paragraphs of a modified page are sent to the server
+    cache_paragraphs = Type(bool, default=False)
+
+    # What to check: 'markdown' checks the source files, 'html' checks the visible text of the rendered pages.
+    # The latter also checks text added by other plugins (like macros or snippets) and never checks code
+    check_source = Choice(["markdown", "html"], default="markdown")
+
+    # Only send the prose to the server. Code blocks, inline code, front matter, URLs and HTML tags are removed before checking
+    strip_markdown = Type(bool, default=True)
+
     # Flag to enable or disable starting docker containers
     docker_create_container = Type(bool, default=True)
 
@@ -53,6 +148,17 @@ class LanguageToolPluginConfig(Config):
     # The name of the container to start and stop. Useful if you have multiple builds running at once
     docker_container_name = Type(str, default="mkdocs-languagetool-plugin")
 
+    # How long to wait for a started container to become ready (in seconds)
+    docker_startup_timeout = Type((int, float), default=120)
+
+    # Keep the container running after the build, so that the next build can use the already warmed up server.
+    # It is replaced when the image, the arguments or the known words change and stopped after being unused for 'docker_idle_timeout' seconds
+    docker_persistent = Type(bool, default=False)
+    docker_idle_timeout = Type(int, default=1800)
+
+    # Number of containers to start. They use consecutive ports starting at 'languagetool_port' and the requests are distributed across them
+    docker_replicas = Type(int, default=1)
+
     # Options tweaking the docker command. For example you can set environment variables to configure Java
     docker_custom_arguments = ListOfItems(Type(str), default=["-e", "Java_Xmx=2g"])
 
@@ -61,5 +167,25 @@ class LanguageToolPluginConfig(Config):
     docker_known_words_directory = Type(str, default="")
 
 
-def get_languagetool_url(plugin_config: LanguageToolPluginConfig) -> str:
-    return f"{plugin_config.languagetool_protocol}://{plugin_config.languagetool_host}:{plugin_config.languagetool_port}/v2/check"
+def get_languagetool_url(plugin_config: LanguageToolPluginConfig, port: Optional[int] = None) -> str:
+    port = plugin_config.languagetool_port if port is None else port
+    return f"{plugin_config.languagetool_protocol}://{plugin_config.languagetool_host}:{port}/v2/check"
+
+
+def get_languagetool_urls(plugin_config: LanguageToolPluginConfig) -> list[str]:
+    if plugin_config.languagetool_urls:
+        return plugin_config.languagetool_urls
+
+    replicas = plugin_config.docker_replicas if plugin_config.docker_create_container else 1
+    return [get_languagetool_url(plugin_config, plugin_config.languagetool_port + index) for index in range(max(replicas, 1))]
+
+
+def create_languagetool_client(plugin_config: LanguageToolPluginConfig) -> LanguageToolClient:
+    return LanguageToolClient(
+        get_languagetool_urls(plugin_config),
+        pool_size=plugin_config.async_threads,
+        connect_timeout=plugin_config.languagetool_connect_timeout,
+        read_timeout=plugin_config.languagetool_read_timeout,
+        max_retries=plugin_config.languagetool_max_retries,
+        retry_backoff=plugin_config.languagetool_retry_backoff,
+    )
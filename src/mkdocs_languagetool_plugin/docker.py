@@ -1,22 +1,30 @@
 import glob
+import hashlib
+import json
 import os
 import shlex
 import subprocess
 import time
+from typing import Optional
 # pip
 from mkdocs.exceptions import PluginError
 # local
-from .languagetool import is_server_reachable
+from .languagetool import LanguageToolClient, is_server_reachable
 from .config import LanguageToolPluginConfig, get_languagetool_url, MY_DOCKER_IMAGE
 from .utils import LOGGER, log_error
+from .idle_shutdown import get_state_file, mark_used, start_watcher
+from .readiness import wait_until_ready
+
+# Label that stores the hash of the configuration a persistent container was started with
+CONFIG_HASH_LABEL = "mkdocs-languagetool-plugin.config-hash"
 
 
 class DockerHandler:
-    def __init__(self, plugin_config: LanguageToolPluginConfig):
+    def __init__(self, plugin_config: LanguageToolPluginConfig, client: LanguageToolClient):
         self.plugin_config = plugin_config
-        self.started_container = False
+        self.started_containers: list[str] = []
         self.docker = plugin_config.docker_binary
-        self.languagetool_url = get_languagetool_url(plugin_config)
+        self.client = client
 
         if self.plugin_config.languagetool_host not in ["127.0.0.1", "::1", "localhost"]:
             LOGGER.warning(f"When starting a container, setting the 'languagetool_host' to a localhost value is expected, but '{self.plugin_config.languagetool_host}' was given.")
@@ -31,60 +39,144 @@ class DockerHandler:
             if not glob.glob(os.path.join(plugin_config.docker_known_words_directory, "custom_words_*.txt")):
                 LOGGER.warning(f"The 'docker_known_words_directory' directory ({plugin_config.docker_known_words_directory}) does not contain any files matching the pattern 'custom_words_*.txt'. Create a file called 'custom_words_any.txt' and add all words to ignore in it (one per line).")
 
+    def get_replicas(self) -> list[tuple[str,int,str]]:
+        """
+        Returns the container name, port and URL of each container to start
+        """
+        replicas = []
+        for index in range(max(self.plugin_config.docker_replicas, 1)):
+            # The first container keeps the configured name, so that a single container behaves like before
+            name = self.plugin_config.docker_container_name if index == 0 else f"{self.plugin_config.docker_container_name}-{index}"
+            port = self.plugin_config.languagetool_port + index
+            replicas.append((name, port, get_languagetool_url(self.plugin_config, port)))
+        return replicas
+
     def start_service(self):
-        if self.plugin_config.docker_known_words_directory and is_server_reachable(self.languagetool_url):
-            # Stop the current server if one exists, since we want to mount the correcy list of words to ignore
-            try:
-                self.run_docker_command_and_return_output(["stop", self.plugin_config.docker_container_name])
-                if is_server_reachable(self.languagetool_url):
-                    LOGGER.info("Stopped already running LanguageTool container")
-                else:
-                    LOGGER.warning("Stop command successfull but service is still running. Did you manually start a LanguageTool server? You can also try to solve this problem it by adding 'languagetool_port: <SOME_FREE_PORT>' in your mkdocs.yml")
-            except subprocess.CalledProcessError:
-                LOGGER.warning("Failed to stop already running LanguageTool container")
-
-        if not is_server_reachable(self.languagetool_url):
-            LOGGER.info(f"LanguageTool server is not reachable, starting {self.docker} container")
+        replicas = self.get_replicas()
+
+        if self.plugin_config.docker_persistent:
+            # Reuse the running containers, unless they were started with a different configuration
+            for name, port, url in replicas:
+                running_hash = self.get_running_container_hash(name)
+                if running_hash is not None and running_hash != self.get_config_hash(name, port):
+                    LOGGER.info(f"Configuration of container {name} changed, replacing it")
+                    self.stop_running_container(name, url)
+        elif self.plugin_config.docker_known_words_directory:
+            for name, _, url in replicas:
+                if is_server_reachable(self.client, url):
+                    self.stop_running_container(name, url)
+
+        if self.plugin_config.docker_persistent:
+            self.mark_persistent_containers_used()
+
+        missing_replicas = [(name, port, url) for name, port, url in replicas if not is_server_reachable(self.client, url)]
+        if not missing_replicas:
+            if self.plugin_config.docker_persistent:
+                LOGGER.info("Reusing the already running LanguageTool container(s)")
+            return
+
+        LOGGER.info(f"LanguageTool server is not reachable, starting {len(missing_replicas)} {self.docker} container(s)")
+        start_time = time.monotonic()
+        for name, port, _ in missing_replicas:
             try:
-                mount_known_words = ["-v", f"{self.plugin_config.docker_known_words_directory}:/share:ro"] if self.plugin_config.docker_known_words_directory else []
-                self.run_docker_command_and_return_output([
-                    # Start a new container
-                    "run",
-                    # Remove the container when it is stopped
-                    "--rm",
-                    # Forward the docker containers LanguageTool API to localhost
-                    "-p", f"{self.plugin_config.languagetool_port}:8010",
-                    # Give the container a name, so that we can easily stop it
-                    "--name", self.plugin_config.docker_container_name,
-                    # User supplied arguments, for example to set environment variables
-                    *self.plugin_config.docker_custom_arguments,
-                    # Run the container in the background
-                    "-d",
-                    # If we mount known words into the container, this is done by this argument
-                    *mount_known_words,
-                    # The image to base the container on
-                    self.plugin_config.docker_image
-                ])
-                self.started_container = True
-
-                # wait for the container to be started (up to 15 seconds)
-                for _ in range(150):
-                    if is_server_reachable(self.languagetool_url):
-                        LOGGER.info(f"LanguageTool server started successfully with {self.docker}")
-                        return
-                    time.sleep(0.1)
-                
-                log_error(f"LanguageTool container was started with {self.docker}, but service can not be reached")
+                self.start_container(name, port)
+                if not self.plugin_config.docker_persistent:
+                    self.started_containers.append(name)
             except subprocess.CalledProcessError as ex:
-                (f"Could not start LanguageTool container with {self.docker}. Process exited with code {ex.returncode} and output '{ex.output}'")
+                log_error(f"Could not start LanguageTool container with {self.docker}. Process exited with code {ex.returncode} and output '{ex.output}'", self.plugin_config)
+                return
+
+        # All containers start at the same time, so we only need to wait for the slowest one
+        waiting_urls = wait_until_ready(self.client, [url for _, _, url in missing_replicas], self.plugin_config.docker_startup_timeout)
+        if waiting_urls:
+            log_error(f"LanguageTool container was started with {self.docker}, but service can not be reached at {', '.join(waiting_urls)} after {self.plugin_config.docker_startup_timeout} seconds. You can increase 'docker_startup_timeout' on slow machines", self.plugin_config)
+        else:
+            LOGGER.info(f"LanguageTool server started successfully with {self.docker} in {time.monotonic() - start_time:.1f} seconds")
+
+    def stop_running_container(self, name: str, url: str) -> None:
+        # Stop the current server if one exists, since we want to mount the correcy list of words to ignore
+        try:
+            self.run_docker_command_and_return_output(["stop", name])
+            if is_server_reachable(self.client, url):
+                LOGGER.warning("Stop command successfull but service is still running. Did you manually start a LanguageTool server? You can also try to solve this problem it by adding 'languagetool_port: <SOME_FREE_PORT>' in your mkdocs.yml")
+            else:
+                LOGGER.info("Stopped already running LanguageTool container")
+        except subprocess.CalledProcessError:
+            LOGGER.warning("Failed to stop already running LanguageTool container")
+
+    def start_container(self, name: str, port: int) -> None:
+        if self.plugin_config.docker_persistent:
+            # The label is used by later builds to check whether the container can be reused
+            label = ["--label", f"{CONFIG_HASH_LABEL}={self.get_config_hash(name, port)}"]
+        else:
+            label = []
+        self.run_docker_command_and_return_output(["run", *label, *self.get_run_arguments(name, port)])
+
+    def get_run_arguments(self, name: str, port: int) -> list[str]:
+        mount_known_words = ["-v", f"{self.plugin_config.docker_known_words_directory}:/share:ro"] if self.plugin_config.docker_known_words_directory else []
+        return [
+            # Remove the container when it is stopped
+            "--rm",
+            # Forward the docker containers LanguageTool API to localhost
+            "-p", f"{port}:8010",
+            # Give the container a name, so that we can easily stop it
+            "--name", name,
+            # User supplied arguments, for example to set environment variables
+            *self.plugin_config.docker_custom_arguments,
+            # Run the container in the background
+            "-d",
+            # If we mount known words into the container, this is done by this argument
+            *mount_known_words,
+            # The image to base the container on
+            self.plugin_config.docker_image
+        ]
+
+    def get_config_hash(self, name: str, port: int) -> str:
+        """
+        Hashes everything that influences the behaviour of a container: the arguments (including the image) and the known words
+        """
+        known_words = {}
+        if self.plugin_config.docker_known_words_directory:
+            for path in sorted(glob.glob(os.path.join(self.plugin_config.docker_known_words_directory, "custom_words_*.txt"))):
+                with open(path, "rb") as f:
+                    known_words[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+
+        hash_input = json.dumps([self.get_run_arguments(name, port), known_words], sort_keys=True)
+        return hashlib.sha256(hash_input.encode("utf-8")).hexdigest()
+
+    def get_running_container_hash(self, name: str) -> Optional[str]:
+        """
+        Returns the configuration hash of the container or None, if the container does not exist or is not running
+        """
+        try:
+            output = self.run_docker_command_and_return_output(["inspect", "--format", f'{{{{.State.Running}}}} {{{{index .Config.Labels "{CONFIG_HASH_LABEL}"}}}}', name])
+        except subprocess.CalledProcessError:
+            return None
+
+        running, _, config_hash = output.decode().strip().partition(" ")
+        return config_hash if running == "true" else None
+
+    def mark_persistent_containers_used(self) -> None:
+        """
+        Resets the idle timer of the persistent containers and makes sure that they will be stopped when they are not used anymore
+        """
+        state_file = get_state_file(self.plugin_config.docker_container_name)
+        mark_used(state_file, [name for name, _, _ in self.get_replicas()])
+        start_watcher(self.docker, self.plugin_config.docker_idle_timeout, state_file)
 
     def stop_service(self):
-        if self.started_container:
-            LOGGER.info("Stopping LanguageTool container")
+        if self.plugin_config.docker_persistent:
+            # Keep the containers running for the next build. The idle timer starts now
+            self.mark_persistent_containers_used()
+
+        if self.started_containers:
+            LOGGER.info(f"Stopping {len(self.started_containers)} LanguageTool container(s)")
             try:
-                self.run_docker_command_and_return_output(["stop", "mkdocs-languagetool-plugin"])
+                # A single command stops all containers in parallel
+                self.run_docker_command_and_return_output(["stop", *self.started_containers])
             except subprocess.CalledProcessError as ex:
                 LOGGER.warning(f"Could not stop LanguageTool container with {self.docker}. Process exited with code {ex.returncode} and output '{ex.output}'")
+            self.started_containers = []
 
 
     def run_docker_command_and_return_output(self, arguments: list[str]) -> bytes:
@@ -0,0 +1,166 @@
+import bisect
+import re
+from typing import Optional
+from html.parser import HTMLParser
+
+# The content of these elements is not prose
+SKIPPED_TAGS = {"script", "style", "pre", "kbd", "samp", "svg", "math", "template", "textarea", "select"}
+# Elements with these classes are added by MkDocs or themes (like the permalink next to headings)
+SKIPPED_CLASSES = {"headerlink", "md-source-file", "linenos"}
+# These elements start a new paragraph, so that the text of two blocks is not joined into one sentence
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "caption", "dd", "details", "div", "dl", "dt", "figcaption", "figure",
+    "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "section", "summary",
+    "table", "td", "th", "tr", "ul",
+}
+# Void elements have no end tag, so they must not be counted as open skipped elements
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Inline code is replaced with a neutral word like in prose.py, so that the surrounding sentence stays grammatical
+INLINE_CODE_PLACEHOLDER = "code"
+BLOCK_SEPARATOR = "\n\n"
+WORD = re.compile(r"\w{3,}")
+# The first words of a block are used to find it in the source
+ANCHOR_WORDS = 5
+# How many characters after the start of a block a word is searched for in the source
+MAX_SEARCH_DISTANCE = 2000
+
+
+class VisibleTextParser(HTMLParser):
+    """
+    Collects the text that is visible on the rendered page, split into blocks (paragraphs, list items, headings, ...)
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: list[str] = []
+        self.current_block: list[str] = []
+        # Stack of the open elements, whose content is skipped (or replaced)
+        self.skipped_stack: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in BLOCK_TAGS:
+            self.end_block()
+        if tag in VOID_TAGS:
+            return
+
+        if self.skipped_stack:
+            self.skipped_stack.append(tag)
+            return
+
+        classes = set((dict(attrs).get("class") or "").split())
+        if tag in SKIPPED_TAGS or classes & SKIPPED_CLASSES:
+            self.skipped_stack.append(tag)
+        elif tag == "code":
+            self.current_block.append(INLINE_CODE_PLACEHOLDER)
+            self.skipped_stack.append(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.skipped_stack and tag in self.skipped_stack:
+            # Also closes elements without an end tag, that were opened inside the skipped element
+            del self.skipped_stack[len(self.skipped_stack) - 1 - self.skipped_stack[::-1].index(tag):]
+        if tag in BLOCK_TAGS:
+            self.end_block()
+
+    def handle_data(self, data: str) -> None:
+        if not self.skipped_stack:
+            self.current_block.append(data)
+
+    def end_block(self) -> None:
+        # Line breaks inside a block are only formatting, they are not visible on the page
+        text = " ".join("".join(self.current_block).split())
+        if text:
+            self.blocks.append(text)
+        self.current_block = []
+
+
+class HtmlText:
+    """
+    The visible text of a rendered page. It has the same interface as ProseText, so that it can be checked the same way.
+    Offsets in the rendered text are mapped back to the markdown source by searching for the words in the source.
+    Text that does not exist in the source (for example added by other plugins) is mapped to the nearest block that exists.
+    """
+    def __init__(self, html: str, source_text: str):
+        self.source_text = source_text
+        parser = VisibleTextParser()
+        parser.feed(html)
+        parser.close()
+        parser.end_block()
+
+        self.text = BLOCK_SEPARATOR.join(parser.blocks)
+        self.block_starts: list[int] = []
+        # Position in the source, where each block (probably) starts and whether the block was found in the source at all
+        self.block_source_starts: list[int] = []
+        self.block_found: list[bool] = []
+        position = 0
+        # Blocks appear in the same order as in the source, so each block is searched after the previous one
+        source_position = 0
+        for block in parser.blocks:
+            self.block_starts.append(position)
+            block_source = self.find_block(block, source_position)
+            if block_source:
+                block_source_start, source_position = block_source
+            else:
+                # Text without source (for example added by a macro) is mapped to the end of the previous block
+                block_source_start = source_position
+            self.block_source_starts.append(block_source_start)
+            self.block_found.append(block_source is not None)
+            position += len(block) + len(BLOCK_SEPARATOR)
+
+    def find_block(self, block: str, source_position: int) -> Optional[tuple[int,int]]:
+        """
+        Returns where the block starts and ends in the source, or None if it is not in the source.
+        The longest of the first words is the most unique one, so it is used as the anchor. Occurrences that are not
+        surrounded by the other first words of the block (like the same word in another paragraph) are skipped.
+        """
+        words = WORD.findall(block[:200])[:ANCHOR_WORDS]
+        if not words:
+            return None
+        anchor_index = words.index(max(words, key=len))
+        anchor = words[anchor_index]
+        # The source contains markup (like link targets), so it can be longer than the block
+        window = len(block) * 2
+        for match in re.compile(rf"\b{re.escape(anchor)}\b").finditer(self.source_text, source_position):
+            # Go back to the start of the line, since the anchor may not be the first word of the block
+            block_source_start = max(self.source_text.rfind("\n", 0, match.start()) + 1, source_position)
+            text_before = self.source_text[block_source_start:match.start()]
+            text_after = self.source_text[match.end():match.end() + window]
+            found_words = sum(word in text_before for word in words[:anchor_index]) + sum(word in text_after for word in words[anchor_index + 1:])
+            if found_words * 2 >= len(words) - 1:
+                return block_source_start, self.find_block_end(block, anchor, match.end())
+        return None
+
+    def find_block_end(self, block: str, anchor: str, anchor_end: int) -> int:
+        # The next block is searched after the last word of this block. It is only searched in the part of the source,
+        # that corresponds to the text after the anchor, since the last word may also occur in the next blocks
+        text_after_anchor = block[block.find(anchor) + len(anchor):]
+        last_words = WORD.findall(text_after_anchor)
+        if not last_words:
+            return anchor_end
+        match = re.compile(rf"\b{re.escape(last_words[-1])}\b").search(self.source_text, anchor_end, anchor_end + len(text_after_anchor) * 2)
+        return match.end() if match else anchor_end
+
+    def remap_match(self, match: dict) -> dict:
+        """
+        Translates a LanguageTool match for the rendered text into a match for the markdown source.
+        The context stays the rendered text, since the source may look very different.
+        """
+        if not self.block_starts:
+            return {**match, "offset": 0, "length": 0}
+
+        block_index = max(bisect.bisect_right(self.block_starts, match["offset"]) - 1, 0)
+        block_source_start = self.block_source_starts[block_index]
+        flagged_text = self.text[match["offset"]:match["offset"] + match["length"]]
+        if not flagged_text or not self.block_found[block_index]:
+            return {**match, "offset": block_source_start, "length": 0}
+
+        # If the text occurs multiple times in the block, the n-th occurrence in the block is most likely the n-th occurrence in the source
+        pattern = re.compile(rf"(?<!\w){re.escape(flagged_text)}(?!\w)")
+        occurrence = len(pattern.findall(self.text, self.block_starts[block_index], match["offset"]))
+        found = None
+        for index, candidate in enumerate(pattern.finditer(self.source_text, block_source_start, block_source_start + MAX_SEARCH_DISTANCE)):
+            found = candidate
+            if index == occurrence:
+                break
+
+        if found:
+            return {**match, "offset": found.start(), "length": len(flagged_text)}
+        return {**match, "offset": block_source_start, "length": 0}
@@ -0,0 +1,83 @@
+"""
+Stops persistent LanguageTool containers after they have not been used for a while.
+
+This runs as a detached background process (started by DockerHandler), since the containers should outlive the mkdocs build.
+Every build writes the names of its containers to the state file.
+The containers are stopped once the state file has not been modified for the idle timeout.
+
+Usage: python -m mkdocs_languagetool_plugin.idle_shutdown <docker_binary> <idle_timeout> <state_file>
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Upper limit for how long the watcher sleeps between two checks (in seconds)
+MAX_CHECK_INTERVAL = 60
+
+
+def get_state_file(container_name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"mkdocs-languagetool-plugin-{container_name}.last-used")
+
+
+def mark_used(state_file: str, container_names: list[str]) -> None:
+    with open(state_file, "w") as f:
+        f.write("\n".join(container_names))
+
+
+def is_watcher_running(state_file: str) -> bool:
+    try:
+        with open(f"{state_file}.pid", "r") as f:
+            pid = int(f.read().strip())
+        # Signal 0 only checks whether the process exists
+        os.kill(pid, 0)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def start_watcher(docker: str, idle_timeout: int, state_file: str) -> None:
+    """
+    Starts a watcher process for the containers listed in the state file, unless one is already running
+    """
+    if is_watcher_running(state_file):
+        return
+
+    subprocess.Popen(
+        [sys.executable, "-m", __name__, docker, str(idle_timeout), state_file],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        # Detach from the build, so that the watcher is not killed when mkdocs exits
+        start_new_session=True,
+    )
+
+
+def watch(docker: str, idle_timeout: int, state_file: str) -> None:
+    with open(f"{state_file}.pid", "w") as f:
+        f.write(str(os.getpid()))
+
+    try:
+        while True:
+            try:
+                idle_time = time.time() - os.path.getmtime(state_file)
+            except OSError:
+                # The state file was removed, so somebody else took care of the containers
+                return
+
+            if idle_time >= idle_timeout:
+                with open(state_file, "r") as f:
+                    container_names = f.read().split()
+                subprocess.run([docker, "stop", *container_names], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                os.remove(state_file)
+                return
+
+            time.sleep(min(idle_timeout - idle_time, MAX_CHECK_INTERVAL) + 1)
+    finally:
+        try:
+            os.remove(f"{state_file}.pid")
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    watch(sys.argv[1], int(sys.argv[2]), sys.argv[3])
@@ -0,0 +1,132 @@
+import bisect
+import re
+from typing import NamedTuple
+# local
+from .languagetool import LanguageToolClient, request_matches
+from .cache import ResultCache
+
+# Paragraphs are separated by one or more blank lines
+PARAGRAPH_SEPARATOR = re.compile(r"\n[ \t]*\n\s*")
+# Used to join the paragraphs that need to be checked into a single request
+REQUEST_SEPARATOR = "\n\n"
+
+
+class TextChunk(NamedTuple):
+    # Position of the chunk in the full text
+    offset: int
+    text: str
+
+
+def split_into_chunks(text: str) -> list[TextChunk]:
+    chunks = []
+    start = 0
+    for separator in PARAGRAPH_SEPARATOR.finditer(text):
+        if separator.start() > start:
+            chunks.append(TextChunk(start, text[start:separator.start()]))
+        start = separator.end()
+
+    if start < len(text):
+        chunks.append(TextChunk(start, text[start:]))
+    return chunks
+
+
+class ChunkRequest:
+    """
+    Joins multiple chunks into the text of a single request and splits the matches back to the chunks they belong to
+    """
+    def __init__(self, chunks: dict[str,str]):
+        self.keys = list(chunks)
+        self.chunk_starts = []
+        self.text = ""
+        for key in self.keys:
+            if self.text:
+                self.text += REQUEST_SEPARATOR
+            self.chunk_starts.append(len(self.text))
+            self.text += chunks[key]
+
+    def split_matches(self, matches: list[dict]) -> dict[str,list[dict]]:
+        chunk_matches: dict[str,list[dict]] = {key: [] for key in self.keys}
+        for match in matches:
+            index = bisect.bisect_right(self.chunk_starts, match["offset"]) - 1
+            chunk_matches[self.keys[index]].append({**match, "offset": match["offset"] - self.chunk_starts[index]})
+        return chunk_matches
+
+
+class IncrementalCheck:
+    """
+    Checks the text paragraph by paragraph. Only paragraphs without cached results are sent to the server (in a single request).
+    The request (if any is needed) is sent by the caller, who then passes the matches to finish().
+    """
+    def __init__(self, text: str, language: str, custom_request_options: dict, cache: ResultCache):
+        self.cache = cache
+        self.chunks = split_into_chunks(text)
+        self.chunk_keys = [cache.get_key(chunk.text, language, custom_request_options, kind="paragraph") for chunk in self.chunks]
+        # Matches for each chunk, with offsets relative to the start of the chunk
+        self.chunk_matches: dict[str,list[dict]] = {}
+        missing_chunks: dict[str,str] = {}
+
+        for chunk, key in zip(self.chunks, self.chunk_keys):
+            if key not in self.chunk_matches and key not in missing_chunks:
+                matches = cache.get_matches(key)
+                if matches is None:
+                    missing_chunks[key] = chunk.text
+                else:
+                    self.chunk_matches[key] = matches
+
+        self.request = ChunkRequest(missing_chunks) if missing_chunks else None
+
+    def finish(self, matches: list[dict]) -> list[dict]:
+        """
+        Stores the matches for the requested paragraphs in the cache and returns the matches for the full text.
+        The offsets of the matches are mapped back to the full text, so that the line numbers are correct.
+        """
+        if self.request:
+            for key, chunk_matches in self.request.split_matches(matches).items():
+                self.chunk_matches[key] = chunk_matches
+                self.cache.put_matches(key, chunk_matches)
+
+        full_text_matches = []
+        for chunk, key in zip(self.chunks, self.chunk_keys):
+            for match in self.chunk_matches[key]:
+                full_text_matches.append({**match, "offset": match["offset"] + chunk.offset})
+        return full_text_matches
+
+
+def request_matches_chunked(text: str, client: LanguageToolClient, language: str, custom_request_options: dict, max_characters: int) -> list[dict]:
+    """
+    Like request_matches, but texts longer than max_characters are split at paragraph boundaries and sent in multiple requests.
+    The offsets of the returned matches are relative to the full text.
+    """
+    if len(text) <= max_characters:
+        return request_matches(text, client, language, custom_request_options)
+
+    matches = []
+    for group in group_chunks(split_into_chunks(text), max_characters):
+        chunk_matches = check_chunks({str(index): chunk.text for index, chunk in enumerate(group)}, client, language, custom_request_options)
+        for index, chunk in enumerate(group):
+            matches += [{**match, "offset": match["offset"] + chunk.offset} for match in chunk_matches[str(index)]]
+    return matches
+
+
+def group_chunks(chunks: list[TextChunk], max_characters: int) -> list[list[TextChunk]]:
+    """
+    Groups consecutive chunks, so that the joined text of each group has at most max_characters (unless a single chunk is longer)
+    """
+    groups: list[list[TextChunk]] = []
+    size = 0
+    for chunk in chunks:
+        if groups and size + len(REQUEST_SEPARATOR) + len(chunk.text) <= max_characters:
+            groups[-1].append(chunk)
+            size += len(REQUEST_SEPARATOR) + len(chunk.text)
+        else:
+            groups.append([chunk])
+            size = len(chunk.text)
+    return groups
+
+
+def check_chunks(chunks: dict[str,str], client: LanguageToolClient, language: str, custom_request_options: dict) -> dict[str,list[dict]]:
+    """
+    Checks multiple chunks with one request and splits the matches back to the chunks they belong to
+    """
+    request = ChunkRequest(chunks)
+    return request.split_matches(request_matches(request.text, client, language, custom_request_options))
@@ -0,0 +1,95 @@
+import fnmatch
+import re
+from typing import Optional
+# pip
+from mkdocs.exceptions import PluginError
+# local
+from .languagetool import LanguageToolResultEntry, is_spelling_rule
+from .config import LanguageToolPluginConfig
+
+
+class KnownWords:
+    """
+    Words that should not be reported as spelling mistakes. This is checked on the client side, so it works with any server
+    and the word lists can be changed without restarting the server (or invalidating cached results).
+
+    Words written in lower case match regardless of the case ('kubernetes' matches 'Kubernetes'),
+    words containing upper case letters only match exactly ('GitHub' does not match 'github').
+    """
+    def __init__(self, words: list[str], file_patterns: dict[str,list[str]]):
+        self.exact_words: set[str] = set()
+        self.folded_words: set[str] = set()
+        for word in words:
+            self.add_word(word)
+
+        # Glob pattern for the file path -> one compiled regex combining all patterns for these files
+        self.file_patterns: list[tuple[str,re.Pattern]] = [
+            (file_glob, re.compile("|".join(f"(?:{pattern})" for pattern in patterns)))
+            for file_glob, patterns in file_patterns.items() if patterns
+        ]
+        # The patterns that apply to a file only need to be determined once per file
+        self.file_pattern_cache: dict[str,list[re.Pattern]] = {}
+
+    def add_word(self, word: str) -> None:
+        word = word.strip()
+        if not word or word.startswith("#"):
+            return
+        if word == word.casefold():
+            self.folded_words.add(word)
+        else:
+            self.exact_words.add(word)
+
+    def load_file(self, path: str) -> None:
+        """
+        Loads a word list with one word per line. Empty lines and lines starting with '#' are ignored
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                self.add_word(line)
+
+    def is_known(self, word: str) -> bool:
+        return word in self.exact_words or word.casefold() in self.folded_words
+
+    def get_file_patterns(self, src_uri: str) -> list[re.Pattern]:
+        patterns = self.file_pattern_cache.get(src_uri)
+        if patterns is None:
+            patterns = [pattern for file_glob, pattern in self.file_patterns if fnmatch.fnmatch(src_uri, file_glob)]
+            self.file_pattern_cache[src_uri] = patterns
+        return patterns
+
+    def filter(self, src_uri: str, results: list[LanguageToolResultEntry]) -> list[LanguageToolResultEntry]:
+        """
+        Removes the spelling mistakes, that are known words or match one of the ignore patterns for the file (given by its path relative to the docs directory)
+        """
+        patterns = self.get_file_patterns(src_uri)
+        return [
+            result for result in results
+            if not is_spelling_rule(result.rule_id) or not self.is_ignored(result.misspelled_string, patterns)
+        ]
+
+    def is_ignored(self, word: str, patterns: list[re.Pattern]) -> bool:
+        return self.is_known(word) or any(pattern.fullmatch(word) for pattern in patterns)
+
+
+def create_known_words(plugin_config: LanguageToolPluginConfig) -> Optional[KnownWords]:
+    """
+    Returns None if no known words are configured, so that the results do not need to be filtered
+    """
+    if not (plugin_config.known_words or plugin_config.known_words_files or plugin_config.ignore_patterns_per_file):
+        return None
+
+    file_patterns = plugin_config.ignore_patterns_per_file
+    if not all(isinstance(patterns, list) and all(isinstance(pattern, str) for pattern in patterns) for patterns in file_patterns.values()):
+        raise PluginError("mkdocs_languagetool_plugin: 'ignore_patterns_per_file' needs to map file patterns to lists of regular expressions")
+
+    try:
+        known_words = KnownWords(plugin_config.known_words, file_patterns)
+    except re.error as ex:
+        raise PluginError(f"mkdocs_languagetool_plugin: Invalid regular expression in 'ignore_patterns_per_file': {ex}")
+
+    for path in plugin_config.known_words_files:
+        try:
+            known_words.load_file(path)
+        except OSError as ex:
+            raise PluginError(f"mkdocs_languagetool_plugin: Failed to load known words file {path}: {ex}")
+    return known_words
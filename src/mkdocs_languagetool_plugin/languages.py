@@ -0,0 +1,183 @@
+import fnmatch
+import re
+from typing import Optional
+# pip
+from mkdocs.exceptions import PluginError
+from mkdocs.structure.files import File
+# local
+from .prose import FRONT_MATTER
+from .config import LanguageToolPluginConfig
+
+# Only the beginning of a file is read to find the language in the front matter
+FRONT_MATTER_MAX_CHARACTERS = 8192
+# Like 'lang: de' or 'language: "en-GB"' in the front matter
+FRONT_MATTER_LANGUAGE = re.compile(r"^(?:lang|language|locale)[ \t]*:[ \t]*[\"']?([A-Za-z]{2,3}(?:[-_][A-Za-z0-9]+)*)[\"']?[ \t]*$", re.MULTILINE)
+WORD = re.compile(r"[^\W\d_]+")
+
+# Very common words of each language. Counting them is enough to tell the languages apart, since every sentence contains some of them
+STOPWORDS = {
+    "en": {
+        "the", "and", "of", "to", "is", "that", "it", "with", "for", "as", "was", "on", "are", "be", "this", "by", "or", "from",
+        "you", "which", "have", "not", "can", "will", "all", "if", "has", "their", "they", "an", "but", "we", "would", "there",
+        "when", "what", "your", "should", "these", "other", "how", "then", "than", "its", "also", "only", "into", "used", "use",
+    },
+    "de": {
+        "der", "die", "und", "das", "ist", "nicht", "ein", "eine", "zu", "den", "dem", "mit", "sich", "des", "auf", "für", "sie",
+        "auch", "es", "wird", "werden", "bei", "oder", "sind", "kann", "wenn", "wie", "nach", "aus", "einer", "noch", "diese",
+        "dieser", "nur", "über", "vom", "zum", "zur", "durch", "wir", "ihr", "ich", "sein", "hat", "haben", "können", "muss",
+    },
+    "fr": {
+        "le", "la", "les", "et", "des", "est", "une", "du", "que", "qui", "dans", "pour", "pas", "sur", "au", "avec", "ce", "il",
+        "sont", "ou", "par", "plus", "vous", "nous", "mais", "cette", "être", "aux", "ces", "peut", "fait", "leur", "comme",
+        "été", "dont", "elle", "aussi", "sans", "tout", "très", "où", "même", "ne", "si", "avoir", "doit", "chaque", "entre",
+    },
+    "es": {
+        "el", "los", "las", "y", "en", "que", "del", "se", "por", "un", "una", "con", "para", "es", "lo", "como", "más", "pero",
+        "sus", "le", "ya", "o", "este", "sí", "porque", "esta", "entre", "cuando", "muy", "sin", "sobre", "también", "hay",
+        "puede", "todos", "uno", "les", "ni", "otros", "ese", "eso", "ante", "ellos", "desde", "nos", "donde", "está", "cada",
+    },
+    "it": {
+        "il", "di", "che", "è", "e", "la", "per", "un", "non", "una", "sono", "del", "della", "dei", "con", "si", "gli", "nel",
+        "alla", "più", "anche", "come", "ma", "questo", "questa", "al", "da", "dal", "nella", "delle", "degli", "può", "essere",
+        "ha", "hanno", "se", "sul", "tra", "quando", "ogni", "molto", "tutti", "perché", "cosa", "ci", "lo", "ancora", "dove",
+    },
+    "nl": {
+        "de", "het", "een", "en", "van", "is", "dat", "op", "te", "zijn", "voor", "met", "niet", "aan", "er", "ook", "als", "bij",
+        "maar", "om", "kan", "wordt", "worden", "dit", "deze", "naar", "heeft", "hebben", "uit", "nog", "wel", "geen", "zo",
+        "moet", "kunnen", "dan", "hun", "jullie", "zal", "omdat", "wat", "waar", "hoe", "ons", "onze", "tot", "door",
+    },
+    "pt": {
+        "o", "os", "as", "e", "do", "da", "dos", "das", "em", "um", "uma", "para", "com", "não", "que", "se", "por", "mais",
+        "na", "no", "como", "mas", "ao", "ele", "ela", "seu", "sua", "ou", "quando", "muito", "nos", "já", "também", "só",
+        "pelo", "pela", "até", "isso", "entre", "depois", "sem", "mesmo", "aos", "seus", "quem", "nas", "esse", "essa", "são",
+    },
+}
+# Words that are in multiple of the lists (like 'de' or 'que') do not help to tell the languages apart
+STOPWORDS = {
+    language: {word for word in words if not any(word in other_words for other_language, other_words in STOPWORDS.items() if other_language != language)}
+    for language, words in STOPWORDS.items()
+}
+# Paragraphs with fewer words are not detected, since the result would be a guess
+MIN_WORDS = 8
+# The detected language needs at least this share of stop words and more than twice as many as any other language
+MIN_STOPWORD_SHARE = 0.15
+DOMINANCE = 2
+
+
+def get_base_language(language: str) -> str:
+    # 'de-DE' -> 'de'
+    return language.split("-")[0].lower()
+
+
+class LanguageDetector:
+    """
+    Detects the language of a paragraph by counting stop words. This is very fast, but only works for the languages
+    in STOPWORDS and only tells apart the configured languages (and the language of the page).
+    The languages are mapped to their variants like the languages of the pages, so that both are checked the same way.
+    """
+    def __init__(self, languages: list[str], variants: dict[str,str]):
+        unsupported = [language for language in languages if get_base_language(language) not in STOPWORDS]
+        if unsupported:
+            raise PluginError(f"mkdocs_languagetool_plugin: Can not detect the language(s) {', '.join(unsupported)}. 'detect_languages' supports: {', '.join(STOPWORDS)}")
+        # Remove duplicates, but keep the order
+        self.languages = list(dict.fromkeys(variants.get(language, language) for language in languages))
+
+    def detect(self, text: str, page_language: str) -> Optional[str]:
+        """
+        Returns the language of the text, if it is clearly one of the configured languages and not the language of the page
+        """
+        words = WORD.findall(text.casefold())
+        if len(words) < MIN_WORDS:
+            return None
+
+        candidates = self.languages
+        if get_base_language(page_language) in STOPWORDS and page_language not in candidates:
+            candidates = [page_language, *candidates]
+        scores = sorted(
+            ((sum(word in STOPWORDS[get_base_language(language)] for word in words), language) for language in candidates),
+            reverse=True,
+        )
+        best_score, best_language = scores[0]
+        second_score = scores[1][0] if len(scores) > 1 else 0
+        if best_language == page_language or best_score < MIN_STOPWORD_SHARE * len(words) or best_score <= DOMINANCE * second_score:
+            return None
+        return best_language
+
+
+class LanguageResolver:
+    """
+    Determines the language of each page. The first of these is used:
+    1. A 'lang', 'language' or 'locale' key in the front matter of the page
+    2. The first pattern in 'language_per_file', that matches the path of the page (like 'de/*' or '*.de.md')
+    3. The locale set by i18n plugins (like mkdocs-static-i18n), if they run before this plugin
+    4. The global 'language'
+    Short codes (like 'de') are replaced by the variants in 'language_variants' (like 'de-DE'), since spell checking needs a variant.
+    """
+    def __init__(self, default_language: str, file_languages: dict[str,str], variants: dict[str,str], detector: Optional[LanguageDetector] = None):
+        self.default_language = default_language
+        self.file_languages = file_languages
+        self.variants = variants
+        self.detector = detector
+        # The language of a file only needs to be determined once
+        self.language_cache: dict[str,str] = {}
+
+    def get_language(self, file: File) -> str:
+        language = self.language_cache.get(file.src_uri)
+        if language is None:
+            language = self.find_language(file) or self.default_language
+            language = self.variants.get(language, language)
+            self.language_cache[file.src_uri] = language
+        return language
+
+    def find_language(self, file: File) -> Optional[str]:
+        language = read_front_matter_language(file.abs_src_path)
+        if language:
+            return language
+        for file_glob, file_language in self.file_languages.items():
+            if fnmatch.fnmatch(file.src_uri, file_glob):
+                return file_language
+        return getattr(file, "locale", None)
+
+    def group_files(self, file_list: list[File]) -> dict[str,list[File]]:
+        """
+        Groups the files by language. The order of the files is kept and the groups are ordered by their first file
+        """
+        groups: dict[str,list[File]] = {}
+        for file in file_list:
+            groups.setdefault(self.get_language(file), []).append(file)
+        return groups
+
+
+def read_front_matter_language(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read(FRONT_MATTER_MAX_CHARACTERS)
+    except (OSError, ValueError):
+        # Unreadable files are reported, when they are checked
+        return None
+
+    front_matter = FRONT_MATTER.match(text)
+    if not front_matter:
+        return None
+    language = FRONT_MATTER_LANGUAGE.search(front_matter.group())
+    # 'de_DE' -> 'de-DE'
+    return language.group(1).replace("_", "-") if language else None
+
+
+def create_language_resolver(plugin_config: LanguageToolPluginConfig) -> LanguageResolver:
+    for name in ["language_per_file", "language_variants"]:
+        if not all(isinstance(key, str) and isinstance(value, str) for key, value in plugin_config[name].items()):
+            raise PluginError(f"mkdocs_languagetool_plugin: '{name}' needs to map strings to language codes")
+
+    detector = LanguageDetector(plugin_config.detect_languages, plugin_config.language_variants) if plugin_config.detect_languages else None
+    return LanguageResolver(plugin_config.language, plugin_config.language_per_file, plugin_config.language_variants, detector)
+
+
+def get_configured_languages(plugin_config: LanguageToolPluginConfig) -> list[str]:
+    """
+    Returns the languages that are known before the pages are read, so that they can be loaded by the warmup
+    """
+    languages = [plugin_config.language, *plugin_config.language_per_file.values(), *plugin_config.detect_languages]
+    languages = [plugin_config.language_variants.get(language, language) for language in languages]
+    # Remove duplicates, but keep the order
+    return list(dict.fromkeys(languages))
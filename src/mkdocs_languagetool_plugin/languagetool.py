@@ -1,75 +1,284 @@
 import json
-from typing import NamedTuple
+import logging
+import re
+import sys
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
 # pip install requests
 import requests
+from requests.adapters import HTTPAdapter
+
+# This module does not depend on mkdocs (see languagetool-cli.py), but it still logs to the mkdocs plugin logger namespace
+LOGGER = logging.getLogger(f"mkdocs.plugins.{__name__}")
 
 
 class LanguageToolResultEntry(NamedTuple):
+    """
+    A single finding. Many of these are kept until the end of the build, so only the necessary data is stored.
+    Strings that repeat between findings (rule, category and message) are interned and the highlighted context is created when needed.
+    """
     rule_id: str
     category_id: str
-    misspelled_string: str
+    message: str
+    # The text around the finding, as returned by the server (with the newlines replaced by spaces)
     context_text: str
-    context_colored: str
+    # Position of the finding in context_text
+    context_offset: int
+    context_length: int
+    # Position of the finding in the checked text
+    offset: int
+    length: int
     line_start: int
     line_end: int
-    raw_dict: dict
+    # The language the text was checked with. Pages can contain multiple languages (see languages.py)
+    language: str = ""
+    # The unparsed match from the server. This is only stored if explicitly requested, since it is much bigger than the rest
+    raw_dict: Optional[dict] = None
+
+    @property
+    def misspelled_string(self) -> str:
+        return self.context_text[self.context_offset:self.context_offset + self.context_length]
+
+    @property
+    def context_colored(self) -> str:
+        context_end = self.context_offset + self.context_length
+        return f"{self.context_text[:self.context_offset]}\033[0;31m{self.misspelled_string}\033[0m{self.context_text[context_end:]}"
 
 
 class LanguageToolError(Exception):
     pass
 
 
-def is_server_reachable(languagetool_url: str):
-    try:
-        spellcheck_text("test", languagetool_url, "en-US")
-        return True
-    except LanguageToolError:
-        return False
+# Spelling rules are named differently for some languages (like MORFOLOGIK_RULE_EN_US, GERMAN_SPELLER_RULE or HUNSPELL_RULE)
+SPELLING_RULE = re.compile(r"MORFOLOGIK_RULE_.*|.*SPELLER_RULE|HUNSPELL_.*")
+
+
+def is_spelling_rule(rule_id: str) -> bool:
+    """
+    Only results of these rules are unknown words, that can be added to a word list
+    """
+    return SPELLING_RULE.fullmatch(rule_id) is not None
+
+
+# Status codes that indicate a temporary problem (overloaded or restarting server), so the request is retried
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# The server is working, but can not handle more requests right now
+OVERLOAD_STATUS_CODES = {429, 503}
+# Upper limit for the delay between two retries (in seconds)
+MAX_RETRY_DELAY = 10
+# Connect and read timeout for checking whether a server is reachable (in seconds)
+PROBE_TIMEOUT = (1, 5)
+
+
+# How long (in seconds) a failing server is not used anymore, if other servers are available
+EJECT_DURATION = 30
+
+
+class LanguageToolEndpoint:
+    def __init__(self, url: str):
+        self.url = url
+        # Number of requests that are currently sent to this server
+        self.outstanding = 0
+        self.ejected_until = 0.0
+
+
+class EndpointPool:
+    """
+    Distributes the requests across one or more LanguageTool servers.
+    Each request goes to the healthy server with the least outstanding requests.
+    Servers that fail are ejected for a while, so that the retries are sent to the other servers.
+    """
+    def __init__(self, urls: list[str], eject_duration: float = EJECT_DURATION):
+        if not urls:
+            raise ValueError("At least one LanguageTool server URL is required")
+        self.endpoints = [LanguageToolEndpoint(url) for url in urls]
+        self.eject_duration = eject_duration
+        self.lock = threading.Lock()
+        # Used to break ties, so that idle servers are used in a round robin fashion
+        self.next_index = 0
+
+    def acquire(self, url: Optional[str] = None) -> LanguageToolEndpoint:
+        with self.lock:
+            if url:
+                endpoint = self.get_endpoint(url)
+                endpoint.outstanding += 1
+                return endpoint
+
+            now = time.monotonic()
+            # Rotate the list, so that servers with the same load take turns
+            candidates = self.endpoints[self.next_index:] + self.endpoints[:self.next_index]
+            self.next_index = (self.next_index + 1) % len(self.endpoints)
+
+            healthy = [endpoint for endpoint in candidates if endpoint.ejected_until <= now]
+            if healthy:
+                endpoint = min(healthy, key=lambda endpoint: endpoint.outstanding)
+            else:
+                # Every server failed recently, so try the one that will be back the soonest
+                endpoint = min(candidates, key=lambda endpoint: endpoint.ejected_until)
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint: LanguageToolEndpoint, healthy: Optional[bool]) -> None:
+        """
+        Marks the request as finished. If healthy is None, the state of the server is not changed
+        """
+        with self.lock:
+            endpoint.outstanding -= 1
+            if healthy is None:
+                pass
+            elif healthy:
+                endpoint.ejected_until = 0.0
+            else:
+                if len(self.endpoints) > 1 and endpoint.ejected_until <= time.monotonic():
+                    LOGGER.warning(f"Not using LanguageTool server {endpoint.url} for {self.eject_duration} seconds, since a request to it failed")
+                endpoint.ejected_until = time.monotonic() + self.eject_duration
+
+    def get_endpoint(self, url: str) -> LanguageToolEndpoint:
+        for endpoint in self.endpoints:
+            if endpoint.url == url:
+                return endpoint
+        # Not part of the pool (for example a server that is only polled), so its state does not need to be tracked
+        return LanguageToolEndpoint(url)
+
+    def has_healthy_endpoint(self) -> bool:
+        now = time.monotonic()
+        return any(endpoint.ejected_until <= now for endpoint in self.endpoints)
+
 
-def spellcheck_file(file_path: str, languagetool_url: str, language: str, custom_request_options: dict = {}) -> list[LanguageToolResultEntry]:
+class LanguageToolClient:
+    """
+    Sends requests to one or more LanguageTool servers.
+    It keeps a pool of connections open and retries requests that failed because of temporary problems.
+    One client can be shared between threads.
+    """
+    def __init__(self, languagetool_urls: list[str], pool_size: int = 10, connect_timeout: float = 5, read_timeout: float = 60, max_retries: int = 3, retry_backoff: float = 0.5):
+        self.endpoints = EndpointPool(languagetool_urls)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # Called when a server answers with 429/503 or times out, so that less requests can be sent (see concurrency.py)
+        self.on_overload: Optional[Callable[[], None]] = None
+
+        self.session = requests.Session()
+        # Every thread needs its own connection, so the pool should be at least as large as the number of threads
+        adapter = HTTPAdapter(pool_connections=len(languagetool_urls), pool_maxsize=max(pool_size, 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, data: dict, max_retries: Optional[int] = None, url: Optional[str] = None) -> requests.Response:
+        """
+        Sends a check request and returns the successful response.
+        Connection errors, timeouts and temporary server errors are retried with an exponential backoff.
+        If multiple servers are configured, the request is retried on another server without waiting.
+        If url is given, the request is sent to that server instead of one chosen from the pool.
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            endpoint = self.endpoints.acquire(url)
+            healthy = False
+            try:
+                response = self.session.post(endpoint.url, data=data, timeout=self.timeout)
+                if response.status_code == 200:
+                    healthy = True
+                    return response
+                error = LanguageToolError(f"LanguageTool server at {endpoint.url} returned unexpected status code {response.status_code}: {response.text}")
+                retryable = response.status_code in RETRY_STATUS_CODES
+                # Other errors (like a bad request) are caused by the request and not by the server
+                healthy = not retryable
+                if response.status_code in OVERLOAD_STATUS_CODES and self.on_overload:
+                    self.on_overload()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as ex:
+                error = LanguageToolError(f"Error connecting to language tool server {endpoint.url}: [{type(ex).__name__}] {ex}")
+                retryable = True
+                if isinstance(ex, requests.exceptions.ReadTimeout) and self.on_overload:
+                    self.on_overload()
+            except Exception as ex:
+                raise LanguageToolError(f"Error connecting to language tool server {endpoint.url}: [{type(ex).__name__}] {ex}")
+            finally:
+                # Requests to a specific server (like warmup requests) bypass the load balancing, so they do not change the state of the server
+                self.endpoints.release(endpoint, healthy if url is None else None)
+
+            if not retryable or attempt >= max_retries:
+                raise error
+
+            if not self.endpoints.has_healthy_endpoint():
+                delay = min(self.retry_backoff * (2 ** attempt), MAX_RETRY_DELAY)
+                LOGGER.debug(f"Retrying request in {delay} seconds after error: {error}")
+                time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def get_languages_url(languagetool_url: str) -> str:
+    # The languages endpoint is next to the check endpoint (like http://localhost:8081/v2/languages)
+    return languagetool_url.rsplit("/", 1)[0] + "/languages"
+
+
+def is_server_reachable(client: LanguageToolClient, url: Optional[str] = None) -> bool:
+    """
+    Checks whether the server (or all servers, if url is None) can answer requests.
+    This is used for polling, so it uses the cheap languages endpoint, short timeouts and no retries.
+    """
+    urls = [url] if url else [endpoint.url for endpoint in client.endpoints.endpoints]
+    for languagetool_url in urls:
+        try:
+            response = client.session.get(get_languages_url(languagetool_url), timeout=PROBE_TIMEOUT)
+            if response.status_code != 200:
+                return False
+        except requests.exceptions.RequestException:
+            return False
+    return True
+
+
+def get_server_version(client: LanguageToolClient) -> str:
+    """
+    Returns the version of the LanguageTool server, which is included in every response to a check request
+    """
+    software = client.post({"language": "en-US", "text": "test"}).json().get("software", {})
+    return f"{software.get('name', 'unknown')} {software.get('version', 'unknown')} {software.get('buildDate', '')}".strip()
+
+
+def spellcheck_file(file_path: str, client: LanguageToolClient, language: str, custom_request_options: dict = {}, keep_raw_matches: bool = False) -> list[LanguageToolResultEntry]:
     with open(file_path, "r", encoding="utf-8") as f:
         text = f.read()
     
-    return spellcheck_text(text, languagetool_url, language, custom_request_options)
+    return spellcheck_text(text, client, language, custom_request_options, keep_raw_matches)
 
 
-def spellcheck_text(text: str, languagetool_url: str, language: str, custom_request_options: dict = {}) -> list[LanguageToolResultEntry]:
+def spellcheck_text(text: str, client: LanguageToolClient, language: str, custom_request_options: dict = {}, keep_raw_matches: bool = False) -> list[LanguageToolResultEntry]:
     """
     This function sends a request to the languagetool server and parses the response.
 
     Parameters:
     - text is the text to check
-    - languagetool_url is an URL like "http://localhost:8081/v2/check"
+    - client is connected to one or more URLs like "http://localhost:8081/v2/check"
     - language is a string like "en-US"
     """
+    matches = request_matches(text, client, language, custom_request_options)
+    return [parse_language_tool_match(match, text, keep_raw_matches, language) for match in matches]
+
 
-    http_body = {
+def request_matches(text: str, client: LanguageToolClient, language: str, custom_request_options: dict = {}) -> list[dict]:
+    """
+    Sends the text to the languagetool server and returns the unparsed matches from the response
+    """
+    return client.post(create_check_request(text, language, custom_request_options)).json().get("matches", [])
+
+
+def create_check_request(text: str, language: str, custom_request_options: dict) -> dict:
+    return {
         **custom_request_options,
         "language": language,
         "text": text,
     }
-    try:
-        response = requests.post(languagetool_url, data=http_body)
-    except requests.exceptions.ConnectionError:
-        raise LanguageToolError(f"Error connecting to language tool server {languagetool_url}: Connection failed")
-    except Exception as ex:
-        raise LanguageToolError(f"Error connecting to language tool server {languagetool_url}: [{type(ex).__name__}] {ex}")
-
-    if response.status_code == 200:
-        result = response.json()
-        return [parse_language_tool_match(match, text) for match in result.get("matches", [])]
-    else:
-        raise LanguageToolError(f"LanguageTool server at {languagetool_url} returned unexpected status code {response.status_code}: {response.text}")
 
 
-def parse_language_tool_match(match: dict, full_text: str) -> LanguageToolResultEntry:
+def parse_language_tool_match(match: dict, full_text: str, keep_raw_match: bool = False, language: str = "") -> LanguageToolResultEntry:
     try:
-        context_start = match["context"]["offset"]
-        context_end = context_start + match["context"]["length"]
-        context_text = match["context"]["text"]
-        misspelled_string = context_text[context_start:context_end]
-        context_colored = f"{context_text[:context_start]}\033[0;31m{misspelled_string}\033[0m{context_text[context_end:]}"
-
         # Figure out wich lines in the original text the error is in
         full_text_start = match["offset"]
         full_text_end = full_text_start + match["length"]
@@ -77,14 +286,18 @@ def parse_language_tool_match(match: dict, full_text: str) -> LanguageToolResult
         match_end_line_index = match_start_line_index + full_text[full_text_start:full_text_end].count("\n")
 
         return LanguageToolResultEntry(
-            rule_id=match["rule"]["id"],
-            category_id=match["rule"]["category"]["id"],
-            misspelled_string=misspelled_string,
-            context_text=context_text,
-            context_colored=context_colored,
+            rule_id=sys.intern(match["rule"]["id"]),
+            category_id=sys.intern(match["rule"]["category"]["id"]),
+            message=sys.intern(match.get("message", "")),
+            context_text=match["context"]["text"],
+            context_offset=match["context"]["offset"],
+            context_length=match["context"]["length"],
+            offset=full_text_start,
+            length=match["length"],
             line_start=match_start_line_index,
             line_end=match_end_line_index,
-            raw_dict=match,
+            language=sys.intern(language),
+            raw_dict=match if keep_raw_match else None,
         )
     except KeyError as e:
         raise LanguageToolError(f"LanguageTool response did not contain the expected key: {e}\nProblematic entry: {json.dumps(match, indent=4)}")
@@ -1,27 +1,69 @@
+import concurrent.futures
 import os
+from typing import Optional
 # pip
 from mkdocs.exceptions import PluginError
 from mkdocs.plugins import BasePlugin, get_plugin_logger
-from mkdocs.structure.files import Files
+from mkdocs.structure.files import File, Files
+from mkdocs.structure.pages import Page
 # local
-from .config import LanguageToolPluginConfig
+from .config import LanguageToolPluginConfig, create_languagetool_client, get_languagetool_urls
 from .languagetool import LanguageToolError
 from .tasks import ParallelLanguageToolTasks, process_sequential_languagetool_tasks
+from .async_tasks import AsyncLanguageToolTasks
 from .docker import DockerHandler
+from .readiness import warm_up
+from .profiling import create_profiler
+from .languages import get_configured_languages
 
 LOGGER = get_plugin_logger(__name__)
 
 
 class LanguageToolPlugin(BasePlugin[LanguageToolPluginConfig]):
-    def on_config(self, config):
-        if self.config.docker_create_container:
-            self.docker_handler = DockerHandler(self.config)
-            self.docker_handler.start_service()
-        else:
-            self.docker_handler = None
+    def __init__(self):
+        self.is_serve = False
+        self.docker_handler = None
+        self.warmed_up = False
+
+    def on_startup(self, command, dirty: bool) -> None:
+        # Defining this makes the plugin instance persist between the rebuilds of 'mkdocs serve'
+        self.is_serve = command == "serve"
 
+    def on_config(self, config):
+        self.client = create_languagetool_client(self.config)
         self.ignore_files = [os.path.normpath(x) for x in self.config.ignore_files]
         self.tasks = None
+        self.profiler = create_profiler(self.config)
+        # Only used when checking the rendered pages (check_source: html)
+        self.checked_files: dict[str,File] = {}
+        self.html_pages: dict[str,str] = {}
+
+        # Starting the server and the checks happens in the background, so that it overlaps with building the site.
+        # The executor has a single thread, so the checks are only started after the server is ready
+        self.background = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="languagetool-setup")
+        self.server_ready = self.background.submit(self.start_server)
+        self.tasks_started: Optional[concurrent.futures.Future] = None
+        # Rendered pages, that are passed to the tasks in the background (check_source: html with the threads engine)
+        self.pages_added: list[concurrent.futures.Future] = []
+
+    def start_server(self) -> None:
+        # In serve mode the container keeps running between rebuilds
+        if self.config.docker_create_container and not self.docker_handler:
+            self.docker_handler = DockerHandler(self.config, self.client)
+            with self.profiler.phase("server startup"):
+                self.docker_handler.start_service()
+        elif self.docker_handler and self.config.docker_persistent:
+            # Resets the idle timer on every rebuild, so that the watcher does not stop the containers while they are used.
+            # If they were stopped while 'mkdocs serve' was idle, they are started again
+            with self.profiler.phase("server startup"):
+                self.docker_handler.start_service()
+
+        if self.config.warmup and not self.warmed_up:
+            self.warmed_up = True
+            with self.profiler.phase("warmup"):
+                # Each language is loaded separately by the server
+                for language in get_configured_languages(self.config):
+                    warm_up(self.client, get_languagetool_urls(self.config), language, self.config.warmup_text)
 
     def on_files(self, files: Files, config) -> Files:
         # Process markdown files only
@@ -29,22 +71,92 @@ class LanguageToolPlugin(BasePlugin[LanguageToolPluginConfig]):
                           if file.src_uri.endswith(".md")
                              and os.path.normpath(file.src_uri) not in self.ignore_files]
 
-        try:
-            if self.config.async_threads > 0:
-                # Run in parallel in the background
-                self.tasks = ParallelLanguageToolTasks(self.config)
-                self.tasks.start_parallel(markdown_files, self.config.async_threads)
+        if self.config.check_source == "html":
+            # The pages are checked once they are rendered (see on_page_content)
+            self.checked_files = {file.src_uri: file for file in markdown_files}
+            if self.config.async_threads > 0 and self.config.check_engine == "threads":
+                self.tasks_started = self.background.submit(self.start_tasks, [])
+        elif self.config.async_threads > 0:
+            # Run in the background, while the site is rendered
+            self.tasks_started = self.background.submit(self.start_tasks, markdown_files)
+        else:
+            # Run sequential right now
+            self.server_ready.result()
+            try:
+                process_sequential_languagetool_tasks(markdown_files, self.config, self.client, self.profiler)
+            except LanguageToolError as ex:
+                raise PluginError(f"LanguageToolError: {ex}")
+
+        return files
+
+    def on_page_content(self, html: str, page: Page, config, files: Files) -> str:
+        file = self.checked_files.get(page.file.src_uri)
+        if file:
+            if self.tasks_started:
+                # Check the page in the background right away. The background thread runs the submitted functions in order, so the tasks exist by then
+                self.pages_added.append(self.background.submit(self.add_html_page, file, html))
             else:
-                # Run sequential right now
-                process_sequential_languagetool_tasks(markdown_files, self.config)
+                # The sequential and the asyncio engine check all pages after the site is built
+                self.html_pages[file.src_uri] = html
+        return html
+
+    def add_html_page(self, file: File, html: str) -> None:
+        if self.tasks:
+            self.tasks.add_batch([file], {file.src_uri: html})
 
-            return files
+    def check_html_pages(self) -> None:
+        files = [self.checked_files[src_uri] for src_uri in self.html_pages]
+        self.server_ready.result()
+        if self.config.async_threads > 0:
+            self.tasks = AsyncLanguageToolTasks(self.config, self.client, self.profiler)
+            self.tasks.start_parallel(files, self.config.asyncio_max_requests, self.html_pages)
+        else:
+            process_sequential_languagetool_tasks(files, self.config, self.client, self.profiler, self.html_pages)
+
+    def start_tasks(self, markdown_files: list[File]) -> None:
+        # Do not start the checks, if the server could not be started. The error is reported in on_post_build
+        if self.server_ready.exception():
+            return
+
+        if self.config.check_engine == "asyncio":
+            # Run in an asyncio event loop in the background
+            self.tasks = AsyncLanguageToolTasks(self.config, self.client, self.profiler)
+            self.tasks.start_parallel(markdown_files, self.config.asyncio_max_requests)
+        else:
+            # Run in parallel in the background
+            self.tasks = ParallelLanguageToolTasks(self.config, self.client, self.profiler)
+            self.tasks.start_parallel(markdown_files, self.config.async_threads)
+
+    def on_post_build(self, config) -> None:
+        try:
+            # This raises the errors that happened while starting the server or the checks
+            self.server_ready.result()
+            if self.tasks_started:
+                self.tasks_started.result()
+            for page_added in self.pages_added:
+                page_added.result()
+            if self.html_pages:
+                self.check_html_pages()
+            if self.tasks:
+                self.tasks.wait_for_parallel()
         except LanguageToolError as ex:
             raise PluginError(f"LanguageToolError: {ex}")
+        finally:
+            self.profiler.log_report(self.config.profile_top_pages)
+            if self.config.profile_trace_file:
+                self.profiler.write_trace(self.config.profile_trace_file)
+            self.background.shutdown()
+            if self.is_serve:
+                self.client.close()
+            else:
+                self.stop_server()
 
-    def on_post_build(self, config) -> None:
-        if self.tasks:
-            self.tasks.wait_for_parallel()
-        
+    def on_shutdown(self) -> None:
+        self.stop_server()
+
+    def stop_server(self) -> None:
         if self.docker_handler:
             self.docker_handler.stop_service()
+            self.docker_handler = None
+
+        self.client.close()
@@ -0,0 +1,97 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Iterator, NamedTuple, Optional
+# local
+from .config import LanguageToolPluginConfig
+from .utils import LOGGER
+
+
+class PageStats(NamedTuple):
+    seconds: float = 0
+    bytes_sent: int = 0
+    matches: int = 0
+
+
+class Profiler:
+    """
+    Records how long each phase of the spell checking takes, in total and per page (or per batch of pages).
+    If it is disabled, phase() does nothing, so the instrumentation can stay in the code.
+    """
+    def __init__(self, enabled: bool, keep_trace_events: bool = False):
+        self.enabled = enabled
+        self.keep_trace_events = keep_trace_events
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.phase_seconds: dict[str,float] = {}
+        self.page_stats: dict[str,PageStats] = {}
+        self.trace_events: list[dict] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str, page: Optional[str] = None, track: Optional[str] = None) -> Iterator[None]:
+        """
+        Measures the code in the 'with' block. The track is the row in the trace, it defaults to the current thread
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start_time
+            with self.lock:
+                self.phase_seconds[name] = self.phase_seconds.get(name, 0) + duration
+                if page is not None:
+                    stats = self.page_stats.get(page, PageStats())
+                    self.page_stats[page] = stats._replace(seconds=stats.seconds + duration)
+                if self.keep_trace_events:
+                    self.trace_events.append({
+                        "name": name,
+                        "ph": "X",
+                        "ts": (start_time - self.origin) * 1_000_000,
+                        "dur": duration * 1_000_000,
+                        "pid": os.getpid(),
+                        "tid": track or threading.current_thread().name,
+                        "args": {"page": page} if page is not None else {},
+                    })
+
+    def add_page_stats(self, page: str, bytes_sent: int = 0, matches: int = 0) -> None:
+        if not self.enabled:
+            return
+
+        with self.lock:
+            stats = self.page_stats.get(page, PageStats())
+            self.page_stats[page] = stats._replace(bytes_sent=stats.bytes_sent + bytes_sent, matches=stats.matches + matches)
+
+    def log_report(self, top_pages: int) -> None:
+        if not self.enabled:
+            return
+
+        with self.lock:
+            phases = "\n".join(f"{name}: {seconds:.2f} s" for name, seconds in sorted(self.phase_seconds.items(), key=lambda x: x[1], reverse=True))
+            LOGGER.info(f"Time spent per phase (summed over all threads):\n{phases}")
+
+            slowest_pages = sorted(self.page_stats.items(), key=lambda x: x[1].seconds, reverse=True)[:top_pages]
+            if slowest_pages:
+                rows = [f"{'seconds':>8} {'KiB sent':>9} {'matches':>8}  page"]
+                rows += [f"{stats.seconds:>8.2f} {stats.bytes_sent / 1024:>9.1f} {stats.matches:>8}  {page}" for page, stats in slowest_pages]
+                LOGGER.info(f"Slowest {len(slowest_pages)} page(s):\n" + "\n".join(rows))
+
+    def write_trace(self, path: str) -> None:
+        """
+        Writes the recorded phases in the Chrome trace event format (open it with chrome://tracing or https://ui.perfetto.dev)
+        """
+        with self.lock:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.trace_events, "displayTimeUnit": "ms"}, f)
+        LOGGER.info(f"Wrote trace with {len(self.trace_events)} events to {path}")
+
+
+def create_profiler(plugin_config: LanguageToolPluginConfig) -> Profiler:
+    # Writing a trace implies profiling
+    enabled = plugin_config.profile or bool(plugin_config.profile_trace_file)
+    return Profiler(enabled, keep_trace_events=bool(plugin_config.profile_trace_file))
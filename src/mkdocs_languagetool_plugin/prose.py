@@ -0,0 +1,187 @@
+import bisect
+import re
+
+# YAML front matter at the very beginning of a page
+FRONT_MATTER = re.compile(r"\A---[ \t]*\n.*?\n(?:---|\.\.\.)[ \t]*(?=\n|\Z)", re.DOTALL)
+# Start of a fenced code block (``` or ~~~), which may be indented (for example inside an admonition)
+FENCE_START = re.compile(r"^[ \t]*(`{3,}|~{3,})", re.MULTILINE)
+HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+# Link reference definitions like '[id]: https://example.com "Title"'. Footnote definitions ('[^1]: Some prose') are prose
+REFERENCE_DEFINITION = re.compile(r"^[ \t]*\[(?!\^)[^\]\n]+\]:[ \t]*\S+.*$", re.MULTILINE)
+# Footnote references ('[^1]') and the start of footnote definitions ('[^1]:')
+FOOTNOTE_MARKER = re.compile(r"\[\^[^\]\s]+\]:?")
+# Admonitions ('!!! note "Title"'), collapsible blocks ('??? tip') and content tabs ('=== "Tab"'). Only the title is prose
+BLOCK_HEADER = re.compile(r"^[ \t]*(?:(?:!!!|\?\?\?\+?)[ \t]*[\w-]+(?:[ \t]+[\w-]+)*|===\+?)(?:[ \t]+\"(.*)\")?[ \t]*$", re.MULTILINE)
+INLINE_CODE = re.compile(r"(?<!`)(`+)(?!`).+?(?<!`)\1(?!`)")
+# Inline links and images. Only the link text / alt text is prose. The target may contain parentheses (like Wikipedia URLs)
+LINK = re.compile(r"!?\[([^\]\n]*)\](\((?:[^()\n]|\([^()\n]*\))*\)|\[[^\]\n]*\])")
+# Trailing punctuation is most likely part of the sentence and not of the URL
+URL = re.compile(r"<?\bhttps?://[^\s<>()\[\]\"'`]*[^\s<>()\[\]\"'`.,:;!?]>?")
+HTML_TAG = re.compile(r"</?[A-Za-z][^>\n]*>")
+
+# Removed inline spans are replaced with a neutral word, so that the surrounding sentence stays grammatical
+INLINE_CODE_PLACEHOLDER = "code"
+URL_PLACEHOLDER = "URL"
+
+
+class ProseText:
+    """
+    The prose contained in a markdown document, with code blocks, front matter, URLs and markup removed.
+    It keeps track of where each part of the prose came from, so that offsets can be mapped back to the original text.
+    """
+    def __init__(self, original_text: str, masked_spans: list[tuple[int,int,str]]):
+        self.original_text = original_text
+        # Parallel lists (for bisect) describing the segments of the prose text
+        self.segment_starts: list[int] = []
+        self.segment_sources: list[tuple[int,int,bool]] = [] # original start, original end, copied verbatim
+
+        pieces = []
+        length = 0
+        position = 0
+        for start, end, replacement in masked_spans:
+            if start > position:
+                self.add_segment(length, position, start, True)
+                pieces.append(original_text[position:start])
+                length += start - position
+            self.add_segment(length, start, end, False)
+            pieces.append(replacement)
+            length += len(replacement)
+            position = end
+
+        if position < len(original_text) or not self.segment_starts:
+            self.add_segment(length, position, len(original_text), True)
+            pieces.append(original_text[position:])
+
+        self.text = "".join(pieces)
+
+    def add_segment(self, prose_start: int, original_start: int, original_end: int, copied: bool) -> None:
+        self.segment_starts.append(prose_start)
+        self.segment_sources.append((original_start, original_end, copied))
+
+    def to_original_offset(self, offset: int, is_end: bool = False) -> int:
+        # The end of a match belongs to the segment before a boundary, the start to the segment after it
+        if is_end:
+            index = max(bisect.bisect_left(self.segment_starts, offset) - 1, 0)
+        else:
+            index = bisect.bisect_right(self.segment_starts, offset) - 1
+
+        original_start, original_end, copied = self.segment_sources[index]
+        if copied:
+            return original_start + offset - self.segment_starts[index]
+        elif is_end and offset > self.segment_starts[index]:
+            return original_end
+        else:
+            return original_start
+
+    def remap_match(self, match: dict) -> dict:
+        """
+        Translates a LanguageTool match for the prose text into a match for the original text.
+        The context is rebuilt from the original text, so that it shows what the user actually wrote.
+        """
+        start = self.to_original_offset(match["offset"])
+        end = max(start, self.to_original_offset(match["offset"] + match["length"], is_end=True))
+
+        context = match["context"]
+        context_before = context["offset"]
+        context_after = len(context["text"]) - context["offset"] - context["length"]
+        context_start = max(0, start - context_before)
+        context_end = min(len(self.original_text), end + context_after)
+
+        return {
+            **match,
+            "offset": start,
+            "length": end - start,
+            "context": {
+                "text": self.original_text[context_start:context_end].replace("\n", " "),
+                "offset": start - context_start,
+                "length": end - start,
+            },
+        }
+
+
+class SpanCollector:
+    """
+    Collects non-overlapping spans. Spans added first take priority over later ones
+    """
+    def __init__(self):
+        self.starts: list[int] = []
+        self.spans: list[tuple[int,int,str]] = []
+
+    def add(self, start: int, end: int, replacement: str = "") -> bool:
+        index = bisect.bisect_right(self.starts, start)
+        if index > 0 and self.spans[index - 1][1] > start:
+            return False
+        if index < len(self.spans) and self.spans[index][0] < end:
+            return False
+
+        self.starts.insert(index, start)
+        self.spans.insert(index, (start, end, replacement))
+        return True
+
+
+def extract_prose(text: str) -> ProseText:
+    """
+    Removes the parts of a markdown document, that are not prose (and would only cause false positives).
+    Block level elements are removed completely, inline elements are replaced with a placeholder word.
+    """
+    spans = SpanCollector()
+
+    front_matter = FRONT_MATTER.match(text)
+    if front_matter:
+        spans.add(front_matter.start(), front_matter.end())
+
+    for start, end in find_fenced_code_blocks(text):
+        spans.add(start, end)
+
+    for match in HTML_COMMENT.finditer(text):
+        spans.add(match.start(), match.end())
+
+    for match in REFERENCE_DEFINITION.finditer(text):
+        spans.add(match.start(), match.end())
+
+    for match in BLOCK_HEADER.finditer(text):
+        if match.group(1):
+            spans.add(match.start(), match.start(1))
+            spans.add(match.end(1), match.end())
+        else:
+            spans.add(match.start(), match.end())
+
+    for match in INLINE_CODE.finditer(text):
+        spans.add(match.start(), match.end(), INLINE_CODE_PLACEHOLDER)
+
+    for match in FOOTNOTE_MARKER.finditer(text):
+        spans.add(match.start(), match.end())
+
+    for match in LINK.finditer(text):
+        spans.add(match.start(), match.start(1))
+        spans.add(match.end(1), match.end())
+
+    for match in URL.finditer(text):
+        spans.add(match.start(), match.end(), URL_PLACEHOLDER)
+
+    for match in HTML_TAG.finditer(text):
+        spans.add(match.start(), match.end())
+
+    return ProseText(text, spans.spans)
+
+
+def find_fenced_code_blocks(text: str) -> list[tuple[int,int]]:
+    """
+    Returns the spans of all fenced code blocks, from the start of the opening fence to the end of the closing fence.
+    An unclosed code block continues until the end of the document.
+    """
+    blocks = []
+    position = 0
+    while True:
+        opening = FENCE_START.search(text, position)
+        if not opening:
+            return blocks
+
+        fence = opening.group(1)
+        closing = re.compile(rf"^[ \t]*{re.escape(fence[0])}{{{len(fence)},}}[ \t]*$", re.MULTILINE)
+        opening_line_end = text.find("\n", opening.end())
+        closing_match = closing.search(text, opening_line_end) if opening_line_end != -1 else None
+        end = closing_match.end() if closing_match else len(text)
+
+        blocks.append((opening.start(), end))
+        position = end
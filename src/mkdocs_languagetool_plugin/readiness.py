@@ -0,0 +1,57 @@
+import concurrent.futures
+import time
+# local
+from .languagetool import LanguageToolClient, LanguageToolError, is_server_reachable
+from .utils import LOGGER
+
+# The delay between two readiness checks starts small (a running server is detected quickly) and doubles up to this value (in seconds)
+MAX_POLL_DELAY = 1
+INITIAL_POLL_DELAY = 0.05
+# Number of requests to send to each server during the warmup. The first one loads the language, the others let the JVM optimize the code
+WARMUP_REQUESTS = 3
+# Used for the warmup if no 'warmup_text' is configured. It is English, but the configured language is still loaded by the server
+DEFAULT_WARMUP_TEXT = """\
+This paragraph is sent to the server before the real spell checking starts.
+It contains a few sentences, some punctuation (commas, colons: and so on) and numbers like 42, so that most rules are used at least once.
+Their are also a few mistakes in it, wich the server has to find and report.
+"""
+
+
+def wait_until_ready(client: LanguageToolClient, urls: list[str], timeout: float) -> list[str]:
+    """
+    Waits until all servers are ready or the timeout (in seconds) expires.
+    Returns the URLs of the servers that are still not ready.
+    """
+    deadline = time.monotonic() + timeout
+    delay = INITIAL_POLL_DELAY
+    pending_urls = urls
+    while True:
+        pending_urls = [url for url in pending_urls if not is_server_reachable(client, url)]
+        remaining_time = deadline - time.monotonic()
+        if not pending_urls or remaining_time <= 0:
+            return pending_urls
+
+        time.sleep(min(delay, remaining_time))
+        delay = min(delay * 2, MAX_POLL_DELAY)
+
+
+def warm_up(client: LanguageToolClient, urls: list[str], language: str, text: str) -> None:
+    """
+    Sends some text to every server, so that the language is loaded and the code is optimized before the real checks are sent
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        for url, future in [(url, executor.submit(warm_up_server, client, url, language, text or DEFAULT_WARMUP_TEXT)) for url in urls]:
+            try:
+                latencies = future.result()
+                LOGGER.info(f"Warmup of {url}: first request took {latencies[0]:.2f} seconds, last request took {latencies[-1]:.2f} seconds")
+            except LanguageToolError as ex:
+                LOGGER.warning(f"Warmup of {url} failed: {ex}")
+
+
+def warm_up_server(client: LanguageToolClient, url: str, language: str, text: str) -> list[float]:
+    latencies = []
+    for _ in range(WARMUP_REQUESTS):
+        start_time = time.monotonic()
+        client.post({"language": language, "text": text}, url=url)
+        latencies.append(time.monotonic() - start_time)
+    return latencies
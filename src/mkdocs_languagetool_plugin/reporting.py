@@ -0,0 +1,318 @@
+import collections
+import json
+import os
+import shutil
+import threading
+from typing import Optional
+from xml.sax.saxutils import escape, quoteattr
+# pip
+from mkdocs.exceptions import PluginError
+from mkdocs.structure.files import File
+# local
+from .languagetool import LanguageToolResultEntry, is_spelling_rule
+from .config import LanguageToolPluginConfig
+from .utils import LOGGER
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+
+class ResultSink:
+    """
+    Receives the results of each file as soon as it is checked.
+    Sinks should only keep aggregated data, so that the memory usage does not grow with the size of the site.
+    """
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class LogSink(ResultSink):
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        print_individual_errors(file, results)
+
+
+class SummarySink(ResultSink):
+    def __init__(self):
+        self.rule_id_counters: dict[str,int] = {}
+        self.file_error_count: dict[str,int] = {}
+
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        self.file_error_count[file.src_uri] = len(results)
+        for result in results:
+            self.rule_id_counters[result.rule_id] = self.rule_id_counters.get(result.rule_id, 0) + 1
+
+    def close(self) -> None:
+        LOGGER.info("Suggestion count by rule:\n" + format_counters(self.rule_id_counters))
+        LOGGER.info("Suggestion count per file:\n" + format_counters(self.file_error_count))
+
+
+class UnknownWordsSink(ResultSink):
+    """
+    Writes one word list per language. A '{language}' in the path is replaced by the language.
+    Otherwise the language is added before the file extension (like 'unknown.de-DE.txt'), if the results are in multiple languages
+    """
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        # Language -> unknown words
+        self.unknown_words: dict[str,set[str]] = {}
+
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        for result in results:
+            if is_spelling_rule(result.rule_id):
+                self.unknown_words.setdefault(result.language, set()).add(result.misspelled_string)
+
+    def close(self) -> None:
+        if "{language}" not in self.output_path and len(self.unknown_words) <= 1:
+            self.write_words(self.output_path, set().union(*self.unknown_words.values()))
+            return
+
+        for language, words in self.unknown_words.items():
+            if "{language}" in self.output_path:
+                path = self.output_path.replace("{language}", language)
+            else:
+                base, extension = os.path.splitext(self.output_path)
+                path = f"{base}.{language}{extension}"
+            self.write_words(path, words)
+        LOGGER.info(f"Wrote the unknown words for {len(self.unknown_words)} language(s) to separate files")
+
+    def write_words(self, path: str, words: set[str]) -> None:
+        file_contents = "\n".join(sorted(words)) + "\n"
+        with open(path, "w") as f:
+            f.write(file_contents)
+
+
+class JsonLinesSink(ResultSink):
+    """
+    Writes one JSON object per result. Lines are written as soon as a file is checked, so the report can be followed while the build runs
+    """
+    def __init__(self, output_path: str):
+        self.output = open(output_path, "w", encoding="utf-8")
+
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        for result in results:
+            self.output.write(json.dumps(result_to_dict(file, result)) + "\n")
+        self.output.flush()
+
+    def close(self) -> None:
+        self.output.close()
+
+
+class SarifSink(ResultSink):
+    """
+    Writes a SARIF 2.1.0 log, that can for example be uploaded to GitHub code scanning.
+    The results are written as they arrive, only the closing brackets are written at the end.
+    """
+    def __init__(self, output_path: str):
+        self.output = open(output_path, "w", encoding="utf-8")
+        self.result_count = 0
+        header = {
+            "$schema": SARIF_SCHEMA,
+            "version": "2.1.0",
+            "runs": [{"tool": {"driver": {"name": "mkdocs-languagetool-plugin", "informationUri": "https://github.com/six-two/mkdocs-languagetool-plugin"}}, "results": []}],
+        }
+        # Split the document where the results need to be inserted
+        self.output.write(json.dumps(header, indent=2)[:-len("]\n    }\n  ]\n}")] + "\n")
+
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        for result in results:
+            sarif_result = {
+                "ruleId": result.rule_id,
+                "level": "warning",
+                "message": {"text": result.message or result.rule_id},
+                "locations": [{
+                    "physicalLocation": {
+                        # Relative to the working directory (usually the project root), so that CI systems can link the file
+                        "artifactLocation": {"uri": os.path.relpath(file.abs_src_path).replace(os.sep, "/")},
+                        "region": {"startLine": result.line_start, "endLine": result.line_end, "snippet": {"text": result.misspelled_string}},
+                    },
+                }],
+                "properties": {"category": result.category_id},
+            }
+            separator = ",\n" if self.result_count else ""
+            self.output.write(separator + "        " + json.dumps(sarif_result))
+            self.result_count += 1
+        self.output.flush()
+
+    def close(self) -> None:
+        self.output.write("\n      ]\n    }\n  ]\n}\n")
+        self.output.close()
+
+
+class JUnitSink(ResultSink):
+    """
+    Writes a JUnit XML report with one test case per page, that fails if the page has any results.
+    The test cases are written to a temporary file as they arrive, since the header needs the total counts.
+    """
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.body_path = f"{output_path}.tmp"
+        self.body = open(self.body_path, "w", encoding="utf-8")
+        self.test_count = 0
+        self.failure_count = 0
+
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        self.test_count += 1
+        name = quoteattr(file.src_uri)
+        if not results:
+            self.body.write(f'    <testcase classname="languagetool" name={name}/>\n')
+            return
+
+        self.failure_count += 1
+        details = "\n".join(f"{file.src_uri}:{result.line_start} | {result.rule_id} | {result.message} | {result.misspelled_string}" for result in results)
+        self.body.write(f'    <testcase classname="languagetool" name={name}>\n')
+        self.body.write(f'      <failure message={quoteattr(f"{len(results)} suggestion(s)")}>{escape(details)}</failure>\n')
+        self.body.write("    </testcase>\n")
+
+    def close(self) -> None:
+        self.body.close()
+        with open(self.output_path, "w", encoding="utf-8") as output:
+            output.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            output.write(f'<testsuites tests="{self.test_count}" failures="{self.failure_count}">\n')
+            output.write(f'  <testsuite name="languagetool" tests="{self.test_count}" failures="{self.failure_count}">\n')
+            with open(self.body_path, "r", encoding="utf-8") as body:
+                shutil.copyfileobj(body, output)
+            output.write("  </testsuite>\n</testsuites>\n")
+        os.remove(self.body_path)
+
+
+class Baseline:
+    """
+    Results that were already known (and accepted) when the baseline was created.
+    The baseline uses the same format as 'report_jsonl_file'. Results are matched by file, rule and the flagged text,
+    so that they are still recognized after the surrounding lines changed. Each baseline entry suppresses at most one result.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.remaining: collections.Counter = collections.Counter()
+        self.suppressed_count = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.remaining[(entry["file"], entry["rule_id"], entry["text"])] += 1
+
+    def filter(self, file: File, results: list[LanguageToolResultEntry]) -> list[LanguageToolResultEntry]:
+        """
+        Returns only the results that are not in the baseline
+        """
+        new_results = []
+        for result in results:
+            key = (file.src_uri, result.rule_id, result.misspelled_string)
+            if self.remaining[key] > 0:
+                self.remaining[key] -= 1
+                self.suppressed_count += 1
+            else:
+                new_results.append(result)
+        return new_results
+
+
+class Reporter:
+    """
+    Passes the results of each file to all sinks. This is thread safe, since files are checked in parallel.
+    If a baseline is given, the sinks only receive the results that are not in the baseline.
+    """
+    def __init__(self, sinks: list[ResultSink], baseline: Optional[Baseline] = None, fail_on_results: bool = False):
+        self.sinks = sinks
+        self.baseline = baseline
+        self.fail_on_results = fail_on_results
+        self.result_count = 0
+        self.lock = threading.Lock()
+
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        with self.lock:
+            if self.baseline:
+                results = self.baseline.filter(file, results)
+            self.result_count += len(results)
+            for sink in self.sinks:
+                sink.add_file(file, results)
+
+    def close(self) -> None:
+        with self.lock:
+            for sink in self.sinks:
+                sink.close()
+
+            if self.baseline:
+                LOGGER.info(f"Suppressed {self.baseline.suppressed_count} suggestion(s) from the baseline {self.baseline.path}, {self.result_count} suggestion(s) are new")
+                fixed_count = sum(self.baseline.remaining.values())
+                if fixed_count:
+                    LOGGER.info(f"{fixed_count} suggestion(s) from the baseline were not found anymore. Set 'update_baseline' to remove them from the baseline")
+
+            if self.fail_on_results and self.result_count:
+                raise PluginError(f"mkdocs_languagetool_plugin: Found {self.result_count} {'new ' if self.baseline else ''}suggestion(s) and 'fail_on_suggestions' is enabled")
+
+
+class BaselineUpdateSink(ResultSink):
+    """
+    Receives all results (even those in the old baseline) and writes them as the new baseline
+    """
+    def __init__(self, output_path: str):
+        self.writer = JsonLinesSink(output_path)
+
+    def add_file(self, file: File, results: list[LanguageToolResultEntry]) -> None:
+        self.writer.add_file(file, results)
+
+    def close(self) -> None:
+        self.writer.close()
+        LOGGER.info(f"Updated the baseline {self.writer.output.name}")
+
+
+def create_reporter(plugin_config: LanguageToolPluginConfig) -> Reporter:
+    if plugin_config.baseline_file and plugin_config.update_baseline:
+        # All current results are accepted, so they are neither filtered nor cause the build to fail
+        return Reporter([*create_sinks(plugin_config), BaselineUpdateSink(plugin_config.baseline_file)])
+
+    baseline = None
+    if plugin_config.baseline_file:
+        try:
+            baseline = Baseline(plugin_config.baseline_file)
+        except (OSError, ValueError, KeyError) as ex:
+            raise PluginError(f"mkdocs_languagetool_plugin: Failed to load the baseline {plugin_config.baseline_file}: {ex}")
+    return Reporter(create_sinks(plugin_config), baseline, plugin_config.fail_on_suggestions)
+
+
+def create_sinks(plugin_config: LanguageToolPluginConfig) -> list[ResultSink]:
+    sinks: list[ResultSink] = []
+    if plugin_config.print_errors:
+        sinks.append(LogSink())
+    if plugin_config.print_summary:
+        sinks.append(SummarySink())
+    if plugin_config.write_unknown_words_to_file:
+        sinks.append(UnknownWordsSink(plugin_config.write_unknown_words_to_file))
+    if plugin_config.report_jsonl_file:
+        sinks.append(JsonLinesSink(plugin_config.report_jsonl_file))
+    if plugin_config.report_sarif_file:
+        sinks.append(SarifSink(plugin_config.report_sarif_file))
+    if plugin_config.report_junit_file:
+        sinks.append(JUnitSink(plugin_config.report_junit_file))
+    return sinks
+
+
+def result_to_dict(file: File, result: LanguageToolResultEntry) -> dict:
+    return {
+        "file": file.src_uri,
+        "line_start": result.line_start,
+        "line_end": result.line_end,
+        "rule_id": result.rule_id,
+        "category_id": result.category_id,
+        "message": result.message,
+        "text": result.misspelled_string,
+        "context": result.context_text,
+    }
+
+
+def print_individual_errors(file: File, spellcheck_results: list[LanguageToolResultEntry]) -> None:
+    for result in spellcheck_results:
+        line_range = f"{result.line_start}" if result.line_start == result.line_end else f"{result.line_start}-{result.line_end}"
+        LOGGER.info(f"{file.src_uri}:{line_range} | {result.rule_id} | {result.context_colored}")
+
+
+def format_counters(counters: dict[str,int]) -> str:
+    # Sort counters from hightest to lowest and print one per line
+    return "\n".join([
+        f"{name}: {count}"
+        for name, count in
+        sorted(counters.items(), key=lambda x: x[1], reverse=True)
+        if count > 0
+    ])
@@ -1,116 +1,374 @@
 import concurrent.futures
+import os
+import threading
+import time
 import traceback
+from typing import Optional
 # pip
 from mkdocs.structure.files import File
 # local
-from .languagetool import spellcheck_file, LanguageToolResultEntry, LanguageToolError
-from .config import LanguageToolPluginConfig, get_languagetool_url
-from .utils import LOGGER, log_error
+from .languagetool import LanguageToolClient, create_check_request, parse_language_tool_match, LanguageToolResultEntry, LanguageToolError
+from .cache import ResultCache, create_result_cache
+from .incremental import ChunkRequest, IncrementalCheck, split_into_chunks
+from .prose import extract_prose
+from .html_text import HtmlText
+from .reporting import create_reporter
+from .known_words import create_known_words
+from .profiling import Profiler
+from .concurrency import AdaptiveConcurrencyLimit
+from .languages import LanguageDetector, LanguageResolver, create_language_resolver
+from .config import LanguageToolPluginConfig
+from .utils import LOGGER, log_error, exit_if_requested
 
 
 class ParallelLanguageToolTasks:
-    def __init__(self, plugin_config):
+    """
+    Checks the files in the background, while MkDocs builds the site.
+    The results of each file are passed to the reporter as soon as they are available, only wait_for_parallel() blocks.
+    """
+    def __init__(self, plugin_config, client: LanguageToolClient, profiler: Optional[Profiler] = None):
         self.plugin_config = plugin_config
-        self.languagetool_url = get_languagetool_url(plugin_config)
+        self.client = client
+        self.profiler = profiler or Profiler(enabled=False)
         self.custom_request_options = {
             "disabledRules": ",".join(plugin_config.ignore_rules),
         }
+        self.cache = create_result_cache(plugin_config, client)
 
-        self.results: dict[File,list[LanguageToolResultEntry]] = {}
+        self.known_words = create_known_words(plugin_config)
+        self.languages = create_language_resolver(plugin_config)
+        self.reporter = create_reporter(plugin_config)
+        self.future_to_task: dict[concurrent.futures.Future,list[File]] = {}
+        self.executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.concurrency_limit: Optional[AdaptiveConcurrencyLimit] = None
+        # Results are reported by the threads that complete the tasks
+        self.lock = threading.Lock()
+        self.error_count = 0
+        self.start_time = time.monotonic()
+        self.end_time = self.start_time
 
-    def start_parallel(self, file_list: list[File], max_parallel_tasks: int):
-        LOGGER.info(f"Starting parallel spell checking with {max_parallel_tasks} threads")
-        # Use ThreadPoolExecutor to run tasks in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel_tasks) as executor:
-            # Submit tasks asynchronously
-            self.future_to_task = {executor.submit(spellcheck_file, file.abs_src_path, self.languagetool_url, self.plugin_config.language, self.custom_request_options): file for file in file_list}
+    def start_parallel(self, file_list: list[File], max_parallel_tasks: int, html_pages: Optional[dict[str,str]] = None):
+        """
+        Checks all files in the background. If html_pages (src_uri -> rendered HTML) is given, the rendered pages are checked
+        """
+        self.start_executor(max_parallel_tasks)
+        for batch in create_language_batches(sort_largest_first(file_list), self.plugin_config.batch_max_characters, self.languages):
+            self.add_batch(batch, html_pages)
 
-    def wait_for_parallel(self):
-        # Wait for all futures to complete and get the results
-        for future in concurrent.futures.as_completed(self.future_to_task):
-            task_file_argument = self.future_to_task[future]
+    def start_executor(self, max_parallel_tasks: int) -> None:
+        if self.plugin_config.adaptive_concurrency:
+            LOGGER.info(f"Starting parallel spell checking with up to {max_parallel_tasks} threads (adaptive)")
+            self.concurrency_limit = AdaptiveConcurrencyLimit(max_parallel_tasks)
+            self.client.on_overload = self.concurrency_limit.on_overload
+        else:
+            LOGGER.info(f"Starting parallel spell checking with {max_parallel_tasks} threads")
+        self.start_time = time.monotonic()
+        # The executor is not used as a context manager, since leaving the 'with' block would wait for all tasks to finish
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel_tasks, thread_name_prefix="languagetool")
+
+    def add_batch(self, batch: list[File], html_pages: Optional[dict[str,str]] = None) -> None:
+        """
+        Starts checking a batch of files (in the same language). This can be called while other batches are checked
+        """
+        batch_html_pages = [html_pages[file.src_uri] for file in batch] if html_pages else None
+        self.add_task(self.executor.submit(check_batch, batch, self.client, self.plugin_config, self.custom_request_options, self.cache, self.profiler, self.concurrency_limit, batch_html_pages, self.languages), batch)
+
+    def add_task(self, future: concurrent.futures.Future, batch: list[File]) -> None:
+        # Tasks may be added while other tasks finish (and may cancel all tasks)
+        with self.lock:
+            self.future_to_task[future] = batch
+        future.add_done_callback(self.on_task_done)
+
+    def on_task_done(self, future: concurrent.futures.Future) -> None:
+        if future.cancelled():
+            return
+
+        task_batch_argument = self.future_to_task[future]
+        with self.lock:
+            self.end_time = time.monotonic()
             try:
-                result = future.result()
-                self.results[task_file_argument] = result
-                if self.plugin_config.print_errors:
-                    print_individual_errors(task_file_argument, result)
+                with self.profiler.phase("report", format_batch(task_batch_argument)):
+                    for file, result in zip(task_batch_argument, future.result()):
+                        if self.known_words:
+                            result = self.known_words.filter(file.src_uri, result)
+                        self.reporter.add_file(file, result)
             except LanguageToolError as ex:
-                log_error(f"File {task_file_argument.src_uri} caused an LanguageTool error: {ex}", self.plugin_config)
+                self.report_error(f"File(s) {format_batch(task_batch_argument)} caused an LanguageTool error: {ex}")
             except Exception:
-                log_error(f"File {task_file_argument.src_uri} generated an exception: {traceback.format_exc()}", self.plugin_config)
-        
-        result_post_processing(self.plugin_config, self.results)
+                self.report_error(f"File(s) {format_batch(task_batch_argument)} generated an exception: {traceback.format_exc()}")
+
+    def report_error(self, message: str) -> None:
+        # Exceptions raised in a callback are ignored, so the build is aborted later in wait_for_parallel
+        LOGGER.error(message)
+        self.error_count += 1
+        if self.plugin_config.exit_on_error:
+            # Do not check the remaining files, since the build will fail anyways
+            for future in self.future_to_task:
+                future.cancel()
+
+    def wait_for_parallel(self):
+        wait_start_time = time.monotonic()
+        self.wait_for_tasks()
+
+        total_time = self.end_time - self.start_time
+        hidden_time = max(0, min(self.end_time, wait_start_time) - self.start_time)
+        LOGGER.info(f"Spell checking took {total_time:.1f} seconds, {hidden_time:.1f} seconds of it ran in parallel to building the site")
+        if self.concurrency_limit:
+            self.client.on_overload = None
+            LOGGER.info(f"Adaptive concurrency ended with up to {int(self.concurrency_limit.limit)} parallel requests")
 
+        try:
+            if self.error_count:
+                exit_if_requested(self.plugin_config)
+
+            if self.cache:
+                self.cache.evict()
+        finally:
+            # Finish the reports of the pages checked so far, even if the build is aborted
+            self.reporter.close()
+
+    def wait_for_tasks(self) -> None:
+        """
+        Waits until all tasks finished and their results were reported
+        """
+        concurrent.futures.wait(self.future_to_task)
+        # The done callbacks run in the worker threads after the result is set, so the threads also need to finish
+        if self.executor:
+            self.executor.shutdown()
 
-def process_sequential_languagetool_tasks(file_list: list[File], plugin_config: LanguageToolPluginConfig):
-    all_spelling_complaints: dict[str,list[LanguageToolResultEntry]] = {} # file path -> spelling results
-    languagetool_url = get_languagetool_url(plugin_config)
+
+def process_sequential_languagetool_tasks(file_list: list[File], plugin_config: LanguageToolPluginConfig, client: LanguageToolClient, profiler: Optional[Profiler] = None, html_pages: Optional[dict[str,str]] = None):
+    profiler = profiler or Profiler(enabled=False)
+    known_words = create_known_words(plugin_config)
+    languages = create_language_resolver(plugin_config)
+    reporter = create_reporter(plugin_config)
     custom_request_options = {
         "disabledRules": ",".join(plugin_config.ignore_rules),
     }
+    cache = create_result_cache(plugin_config, client)
+
+    try:
+        for batch in create_language_batches(file_list, plugin_config.batch_max_characters, languages):
+            try:
+                batch_html_pages = [html_pages[file.src_uri] for file in batch] if html_pages else None
+                batch_results = check_batch(batch, client, plugin_config, custom_request_options, cache, profiler, html_pages=batch_html_pages, languages=languages)
+
+                with profiler.phase("report", format_batch(batch)):
+                    for file, results in zip(batch, batch_results):
+                        if known_words:
+                            results = known_words.filter(file.src_uri, results)
+                        reporter.add_file(file, results)
+            except LanguageToolError as ex:
+                log_error(f"File(s) {format_batch(batch)} caused an LanguageTool error: {ex}", plugin_config)
+            except Exception:
+                log_error(f"File(s) {format_batch(batch)} generated an exception: {traceback.format_exc()}", plugin_config)
 
+        if cache:
+            cache.evict()
+    finally:
+        # Finish the reports of the pages checked so far, even if the build is aborted
+        reporter.close()
+
+
+def sort_largest_first(file_list: list[File]) -> list[File]:
+    """
+    The largest files take the longest to check. Starting them first prevents them from delaying the end of the spell checking
+    """
+    return sorted(file_list, key=lambda file: os.path.getsize(file.abs_src_path), reverse=True)
+
+
+def create_batches(file_list: list[File], max_characters: int) -> list[list[File]]:
+    """
+    Groups small files, so that they can be checked with a single request.
+    Files that are larger than max_characters get a batch of their own. If max_characters is 0, batching is disabled.
+    """
+    if max_characters <= 0:
+        return [[file] for file in file_list]
+
+    batches = []
+    current_batch: list[File] = []
+    current_size = 0
     for file in file_list:
-        try:
-            results = spellcheck_file(file.abs_src_path, languagetool_url, plugin_config.language, custom_request_options)
+        # The file size in bytes is a cheap upper bound for the number of characters
+        size = os.path.getsize(file.abs_src_path)
+        if current_batch and current_size + size > max_characters:
+            batches.append(current_batch)
+            current_batch = []
+            current_size = 0
+        current_batch.append(file)
+        current_size += size
+
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+
+def create_language_batches(file_list: list[File], max_characters: int, languages: LanguageResolver) -> list[list[File]]:
+    """
+    Like create_batches, but files in different languages are never combined.
+    The batches of each language follow each other, so that the server uses one language at a time
+    """
+    return [batch for files in languages.group_files(file_list).values() for batch in create_batches(files, max_characters)]
+
+
+def format_batch(batch: list[File]) -> str:
+    return ", ".join(file.src_uri for file in batch)
+
+
+def check_batch(batch: list[File], client: LanguageToolClient, plugin_config: LanguageToolPluginConfig, custom_request_options: dict, cache: Optional[ResultCache], profiler: Profiler, concurrency_limit: Optional[AdaptiveConcurrencyLimit] = None, html_pages: Optional[list[str]] = None, languages: Optional[LanguageResolver] = None) -> list[list[LanguageToolResultEntry]]:
+    """
+    Checks a batch of files (see FileBatchCheck) and records the time spent in each phase with the profiler.
+    If a concurrency limit is given, the request waits until the limit allows it (cached results do not wait).
+    All files of the batch are checked with the language of the first file (see create_language_batches)
+    """
+    page = format_batch(batch)
+    language = languages.get_language(batch[0]) if languages else plugin_config.language
+    language_detector = languages.detector if languages else None
+    with profiler.phase("prepare", page):
+        check = FileBatchCheck([file.abs_src_path for file in batch], language, custom_request_options, cache, plugin_config.strip_markdown, plugin_config.keep_raw_matches, html_pages, language_detector)
+
+    matches = []
+    if check.request_text is not None:
+        matches = send_check_request(check.request_text, language, client, custom_request_options, profiler, page, concurrency_limit)
+    foreign_matches = {
+        chunk_language: send_check_request(request.text, chunk_language, client, custom_request_options, profiler, page, concurrency_limit)
+        for chunk_language, request in check.foreign_requests.items()
+    }
+
+    with profiler.phase("parse", page):
+        results = check.finish(matches, foreign_matches)
+    profiler.add_page_stats(page, matches=sum(len(file_results) for file_results in results))
+    return results
+
 
-            if plugin_config.print_errors:
-                print_individual_errors(file, results)
+def send_check_request(text: str, language: str, client: LanguageToolClient, custom_request_options: dict, profiler: Profiler, page: str, concurrency_limit: Optional[AdaptiveConcurrencyLimit] = None) -> list[dict]:
+    request_body = create_check_request(text, language, custom_request_options)
+    with profiler.phase("request", page):
+        if concurrency_limit:
+            response = concurrency_limit.run(lambda: client.post(request_body), len(text))
+        else:
+            response = client.post(request_body)
+    with profiler.phase("decode", page):
+        matches = response.json().get("matches", [])
+    profiler.add_page_stats(page, bytes_sent=len(text.encode("utf-8")))
+    return matches
 
-            all_spelling_complaints[file.src_uri] = results
-        except LanguageToolError as ex:
-            log_error(f"File {file.src_uri} caused an LanguageTool error: {ex}", plugin_config)
-        except Exception:
-            log_error(f"File {file.src_uri} generated an exception: {traceback.format_exc()}", plugin_config)
 
-    result_post_processing(plugin_config, all_spelling_complaints)
+class FileBatchCheck:
+    """
+    Checking a batch of files is split into two steps, so that the request can be sent with a blocking or an asyncio based client:
+    1. The constructor reads the files, loads cached results and builds the text that needs to be sent to the server (request_text)
+    2. finish() splits the matches from the server back to the files they belong to and stores them in the cache
 
+    If html_pages is given, the visible text of the rendered pages is checked instead of the markdown source.
+    If a language detector is given, paragraphs in other languages are removed from request_text and need to be checked
+    with the additional requests in foreign_requests (one per language). Their matches are passed to finish() as foreign_matches.
+    """
+    def __init__(self, file_paths: list[str], language: str, custom_request_options: dict, cache: Optional[ResultCache], strip_markdown: bool, keep_raw_matches: bool = False, html_pages: Optional[list[str]] = None, language_detector: Optional[LanguageDetector] = None):
+        self.cache = cache
+        self.language = language
+        self.keep_raw_matches = keep_raw_matches
+        self.results: list[Optional[list[LanguageToolResultEntry]]] = [None] * len(file_paths)
+        # Index of the file -> text of the file, for all files that need to be sent to the server
+        self.missing_texts: dict[int,str] = {}
+        self.cache_keys: dict[int,str] = {}
 
-def result_post_processing(plugin_config: LanguageToolPluginConfig, all_spelling_complaints: dict[str,list[LanguageToolResultEntry]]) -> None:
-    if plugin_config.print_summary:
-        print_results_summary(all_spelling_complaints)
+        for index, file_path in enumerate(file_paths):
+            with open(file_path, "r", encoding="utf-8") as f:
+                text = f.read()
 
-    if plugin_config.write_unknown_words_to_file:
-        write_unknown_words_to_file(plugin_config.write_unknown_words_to_file, all_spelling_complaints)
+            if cache:
+                # Results with and without markdown stripping (or raw matches) differ, so they need different keys
+                if html_pages:
+                    # The line numbers depend on the source, so both are part of the key
+                    kind, key_text = "html", f"{text}\0{html_pages[index]}"
+                else:
+                    kind, key_text = "prose" if strip_markdown else "file", text
+                if language_detector:
+                    kind += "+detect:" + ",".join(language_detector.languages)
+                self.cache_keys[index] = cache.get_key(key_text, language, custom_request_options, kind=kind + ("+raw" if keep_raw_matches else ""))
+                self.results[index] = cache.get(self.cache_keys[index])
 
+            if self.results[index] is None:
+                self.missing_texts[index] = text
 
-def print_individual_errors(file: File, spellcheck_results: list[LanguageToolResultEntry]) -> None:
-    for result in spellcheck_results:
-        line_range = f"{result.line_start}" if result.line_start == result.line_end else f"{result.line_start}-{result.line_end}"
-        LOGGER.info(f"{file.src_uri}:{line_range} | {result.rule_id} | {result.context_colored}")
+        # If strip_markdown is set, only the prose is sent to the server.
+        # The matches are mapped back to the original text, so that line numbers and contexts are correct.
+        if html_pages:
+            self.proses = {index: HtmlText(html_pages[index], text) for index, text in self.missing_texts.items()}
+        else:
+            self.proses = {index: extract_prose(text) if strip_markdown else None for index, text in self.missing_texts.items()}
+        checked_texts = {str(index): prose.text if prose else self.missing_texts[index] for index, prose in self.proses.items()}
 
+        self.foreign_requests: dict[str,ChunkRequest] = {}
+        if language_detector:
+            checked_texts = self.split_foreign_paragraphs(checked_texts, language_detector)
 
-def print_results_summary(results: dict[File,list[LanguageToolResultEntry]]) -> None:
-    rule_id_counters: dict[str,int] = {}
-    file_error_count: dict[str,int] = {file_path: len(error_list) for file_path, error_list in results.items()}
+        self.incremental_check: Optional[IncrementalCheck] = None
+        self.incremental_index = 0
+        self.chunk_request: Optional[ChunkRequest] = None
+        self.request_text: Optional[str] = None
+        if len(checked_texts) == 1 and cache and cache.cache_paragraphs:
+            # Nothing to combine, so the paragraph cache can be used
+            self.incremental_index = int(next(iter(checked_texts)))
+            self.incremental_check = IncrementalCheck(next(iter(checked_texts.values())), language, custom_request_options, cache)
+            if self.incremental_check.request:
+                self.request_text = self.incremental_check.request.text
+        elif checked_texts:
+            self.chunk_request = ChunkRequest(checked_texts)
+            self.request_text = self.chunk_request.text
 
-    for error_list in results.values():
-        for error in error_list:
-            if error.rule_id in rule_id_counters:
-                rule_id_counters[error.rule_id] += 1
-            else:
-                rule_id_counters[error.rule_id] = 1
+    def split_foreign_paragraphs(self, checked_texts: dict[str,str], language_detector: LanguageDetector) -> dict[str,str]:
+        """
+        Moves the paragraphs in other languages to the foreign requests. They are replaced with spaces, so that the offsets of the other matches stay the same.
+        Returns the remaining texts, which no longer contain texts without any paragraph in the language of the page.
+        """
+        foreign_chunks: dict[str,dict[str,str]] = {}
+        remaining_texts = {}
+        for index, text in checked_texts.items():
+            pieces = []
+            position = 0
+            for chunk in split_into_chunks(text):
+                chunk_language = language_detector.detect(chunk.text, self.language)
+                if chunk_language:
+                    # The key contains the position of the paragraph, so that the matches can be mapped back
+                    foreign_chunks.setdefault(chunk_language, {})[f"{index}:{chunk.offset}"] = chunk.text
+                    pieces += [text[position:chunk.offset], " " * len(chunk.text)]
+                    position = chunk.offset + len(chunk.text)
 
-    LOGGER.info("Suggestion count by rule:\n" + format_counters(rule_id_counters))
-    LOGGER.info("Suggestion count per file:\n" + format_counters(file_error_count))
+            remaining_text = "".join(pieces) + text[position:]
+            if not pieces or remaining_text.strip():
+                remaining_texts[index] = remaining_text
 
+        self.foreign_requests = {chunk_language: ChunkRequest(chunks) for chunk_language, chunks in foreign_chunks.items()}
+        return remaining_texts
 
-def write_unknown_words_to_file(output_path: str, results: dict[File,list[LanguageToolResultEntry]]) -> None:
-    unknown_words: set[str] = set()
-    for error_list in results.values():
-        for error in error_list:
-            if error.rule_id.startswith("MORFOLOGIK_RULE_"):
-                unknown_words.add(error.misspelled_string)
+    def finish(self, matches: list[dict], foreign_matches: Optional[dict[str,list[dict]]] = None) -> list[list[LanguageToolResultEntry]]:
+        """
+        foreign_matches are the matches for each of the foreign_requests (by language)
+        """
+        # Index of the file -> list of (language, match) pairs
+        file_matches: dict[int,list[tuple[str,dict]]] = {index: [] for index in self.missing_texts}
+        if self.incremental_check:
+            file_matches[self.incremental_index] += [(self.language, match) for match in self.incremental_check.finish(matches)]
+        elif self.chunk_request:
+            for index, chunk_matches in self.chunk_request.split_matches(matches).items():
+                file_matches[int(index)] += [(self.language, match) for match in chunk_matches]
 
-    file_contents = "\n".join(sorted(unknown_words)) + "\n"
-    with open(output_path, "w") as f:
-        f.write(file_contents)
+        for chunk_language, request in self.foreign_requests.items():
+            for key, chunk_matches in request.split_matches((foreign_matches or {}).get(chunk_language, [])).items():
+                index, chunk_offset = map(int, key.split(":"))
+                file_matches[index] += [(chunk_language, {**match, "offset": match["offset"] + chunk_offset}) for match in chunk_matches]
 
+        for index, matches_with_language in file_matches.items():
+            if self.foreign_requests:
+                matches_with_language.sort(key=lambda item: item[1]["offset"])
+            prose = self.proses[index]
+            self.results[index] = [
+                parse_language_tool_match(prose.remap_match(match) if prose else match, self.missing_texts[index], self.keep_raw_matches, match_language)
+                for match_language, match in matches_with_language
+            ]
 
-def format_counters(counters: dict[str,int]) -> str:
-    # Sort counters from hightest to lowest and print one per line
-    return "\n".join([
-        f"{name}: {count}"
-        for name, count in
-        sorted(counters.items(), key=lambda x: x[1], reverse=True)
-        if count > 0
-    ])
+            if self.cache:
+                self.cache.put(self.cache_keys[index], self.results[index])
+        return self.results
@@ -11,6 +11,12 @@ def log_error(message: str, plugin_config: LanguageToolPluginConfig) -> None:
     This is a wrapper around the error logging function that will enforce the exit_on_error rule
     """
     LOGGER.error(message)
+    exit_if_requested(plugin_config)
 
+
+def exit_if_requested(plugin_config: LanguageToolPluginConfig) -> None:
+    """
+    Aborts the build after an error was logged, if 'exit_on_error' is enabled
+    """
     if plugin_config.exit_on_error:
         raise PluginError("mkdocs_languagetool_plugin: An error occured and 'exit_on_error' is enabled")
@@ -0,0 +1,44 @@
+import os
+import sys
+import threading
+# pip
+import pytest
+from mkdocs.structure.files import File
+# local
+from mkdocs_languagetool_plugin.config import LanguageToolPluginConfig
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from fake_server import FakeLanguageToolServer
+
+
+@pytest.fixture
+def fake_server_url():
+    # Every word is reported, so that each page has results
+    server = FakeLanguageToolServer(("127.0.0.1", 0), latency=0, latency_per_kb=0, match_density=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v2/check"
+    server.shutdown()
+    server.server_close()
+
+
+def create_plugin_config(options: dict) -> LanguageToolPluginConfig:
+    plugin_config = LanguageToolPluginConfig()
+    plugin_config.load_dict({"docker_create_container": False, "print_errors": False, **options})
+    errors, _warnings = plugin_config.validate()
+    assert not errors
+    return plugin_config
+
+
+def create_files(docs_directory: str, pages: dict[str,str]) -> list[File]:
+    """
+    Writes the pages (path -> markdown) to the docs directory and returns them as MkDocs files
+    """
+    files = []
+    for name, text in pages.items():
+        path = os.path.join(docs_directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        files.append(File(name, docs_directory, os.path.join(docs_directory, "site"), True))
+    return files
@@ -0,0 +1,56 @@
+# local
+from mkdocs_languagetool_plugin.cache import ResultCache
+
+
+class VersionLoader:
+    def __init__(self, version: str):
+        self.version = version
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        return self.version
+
+
+def test_fully_cached_build_does_not_contact_the_server(tmp_path):
+    first_loader = VersionLoader("6.4")
+    cache = ResultCache(str(tmp_path), 100, first_loader)
+    key = cache.get_key("Some text.", "en-US", {})
+    cache.put(key, [])
+    assert first_loader.calls == 1
+
+    second_loader = VersionLoader("6.4")
+    cache = ResultCache(str(tmp_path), 100, second_loader)
+    assert cache.get(cache.get_key("Some text.", "en-US", {})) == []
+    assert second_loader.calls == 0
+
+
+def test_server_version_is_checked_once_on_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path), 100, VersionLoader("6.4"))
+    old_key = cache.get_key("Some text.", "en-US", {})
+    cache.put(old_key, [])
+
+    loader = VersionLoader("6.5")
+    cache = ResultCache(str(tmp_path), 100, loader)
+    assert cache.get(cache.get_key("Other text.", "en-US", {})) is None
+    assert cache.get(cache.get_key("More text.", "en-US", {})) is None
+    assert loader.calls == 1
+    # Results of the old server version are not used anymore
+    assert cache.get(old_key) is None
+    assert ResultCache(str(tmp_path), 100, VersionLoader("6.5")).server_version == "6.5"
+
+
+def test_results_are_stored_for_the_new_server_version(tmp_path):
+    cache = ResultCache(str(tmp_path), 100, VersionLoader("6.4"))
+    cache.put(cache.get_key("Some text.", "en-US", {}), [])
+
+    # The key is created before the miss reveals, that the server was updated
+    cache = ResultCache(str(tmp_path), 100, VersionLoader("6.5"))
+    key = cache.get_key("Other text.", "en-US", {})
+    assert cache.get(key) is None
+    cache.put(key, [])
+
+    loader = VersionLoader("6.5")
+    cache = ResultCache(str(tmp_path), 100, loader)
+    assert cache.get(cache.get_key("Other text.", "en-US", {})) == []
+    assert loader.calls == 0
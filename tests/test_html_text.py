@@ -0,0 +1,44 @@
+# local
+from mkdocs_languagetool_plugin.html_text import HtmlText
+
+
+def get_line(source: str, match: dict) -> int:
+    return source[:match["offset"]].count("\n") + 1
+
+
+def create_match(html_text: HtmlText, word: str, occurrence: int = 0) -> dict:
+    offset = -1
+    for _ in range(occurrence + 1):
+        offset = html_text.text.index(word, offset + 1)
+    return {"offset": offset, "length": len(word)}
+
+
+def test_repeated_word_maps_to_its_own_paragraph():
+    source = "Install zzwidget first.\n\nThen configure zzwidget.\n\nFinally, run zzwidget now.\n"
+    html = "<p>Install zzwidget first.</p>\n<p>Then configure zzwidget.</p>\n<p>Finally, run zzwidget now.</p>"
+    html_text = HtmlText(html, source)
+
+    assert html_text.block_source_starts == [0, 25, 51]
+    for occurrence, line in enumerate([1, 3, 5]):
+        match = html_text.remap_match(create_match(html_text, "zzwidget", occurrence))
+        assert get_line(source, match) == line
+        assert source[match["offset"]:match["offset"] + match["length"]] == "zzwidget"
+
+
+def test_block_without_source_does_not_affect_later_blocks():
+    source = "# Title\n\nThe first paragraph mentions configuration.\n\n{{ macro() }}\n\nThe last paragraph also mentions configuration.\n"
+    html = (
+        "<h1>Title</h1>\n<p>The first paragraph mentions configuration.</p>\n"
+        "<p>Generated by a macro without any configuration.</p>\n"
+        "<p>The last paragraph also mentions configuration.</p>"
+    )
+    html_text = HtmlText(html, source)
+
+    # The generated block is mapped to the previous block, without pretending to know where the word is
+    generated_match = html_text.remap_match(create_match(html_text, "Generated"))
+    assert get_line(source, generated_match) == 3
+    assert generated_match["length"] == 0
+
+    last_match = html_text.remap_match(create_match(html_text, "configuration", 2))
+    assert get_line(source, last_match) == 7
+    assert source[last_match["offset"]:last_match["offset"] + last_match["length"]] == "configuration"
@@ -0,0 +1,25 @@
+# local
+from mkdocs_languagetool_plugin.languages import create_language_resolver
+from conftest import create_plugin_config, create_files
+
+GERMAN_PARAGRAPH = "Das ist ein deutscher Absatz, der auf einer englischen Seite steht und auch mit der deutschen Sprache geprüft werden muss."
+ENGLISH_PARAGRAPH = "This is an English paragraph, which is written on a German page and it should be checked with the English language."
+
+
+def test_detected_languages_use_the_configured_variants(tmp_path):
+    plugin_config = create_plugin_config({
+        "language": "de",
+        "language_variants": {"de": "de-DE", "en": "en-GB"},
+        "language_per_file": {"en/*": "en"},
+        "detect_languages": ["de", "en"],
+    })
+    german_page, english_page = create_files(str(tmp_path), {"index.md": GERMAN_PARAGRAPH, "en/index.md": ENGLISH_PARAGRAPH})
+    languages = create_language_resolver(plugin_config)
+
+    assert languages.get_language(german_page) == "de-DE"
+    assert languages.get_language(english_page) == "en-GB"
+    # Foreign paragraphs are checked with the same language code as whole pages in that language
+    assert languages.detector.detect(ENGLISH_PARAGRAPH, languages.get_language(german_page)) == "en-GB"
+    assert languages.detector.detect(GERMAN_PARAGRAPH, languages.get_language(english_page)) == "de-DE"
+    # Paragraphs in the language of the page are not foreign
+    assert languages.detector.detect(ENGLISH_PARAGRAPH, languages.get_language(english_page)) is None
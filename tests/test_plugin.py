@@ -0,0 +1,73 @@
+# pip
+import pytest
+from mkdocs.exceptions import PluginError
+from mkdocs.structure.files import Files
+from mkdocs.structure.pages import Page
+# local
+from mkdocs_languagetool_plugin import plugin as plugin_module
+from mkdocs_languagetool_plugin.plugin import LanguageToolPlugin
+from conftest import create_files
+
+
+class RecordingDockerHandler:
+    def __init__(self, plugin_config, client):
+        self.start_count = 0
+
+    def start_service(self) -> None:
+        self.start_count += 1
+
+    def stop_service(self) -> None:
+        pass
+
+
+def create_plugin(options: dict, command: str = "build") -> LanguageToolPlugin:
+    plugin = LanguageToolPlugin()
+    plugin.on_startup(command=command, dirty=False)
+    load_plugin_config(plugin, options)
+    return plugin
+
+
+def load_plugin_config(plugin: LanguageToolPlugin, options: dict) -> None:
+    """
+    Loads the config like MkDocs does at the start of every build
+    """
+    errors, _warnings = plugin.load_config({"docker_create_container": False, "print_errors": False, **options})
+    assert not errors
+    plugin.on_config({})
+
+
+def build(plugin: LanguageToolPlugin, files: Files) -> None:
+    """
+    Calls the hooks of the plugin like MkDocs does, with a paragraph of HTML for every page
+    """
+    plugin.on_files(files, {})
+    for file in files:
+        plugin.on_page_content("<p>Some text.</p>", Page(None, file, {}), {}, files)
+    plugin.on_post_build({})
+
+
+@pytest.mark.parametrize("check_source", ["markdown", "html"])
+def test_errors_while_starting_the_checks_fail_the_build(tmp_path, fake_server_url, check_source):
+    files = Files(create_files(str(tmp_path), {"index.md": "Some text.\n", "other.md": "Some text.\n"}))
+    plugin = create_plugin({
+        "languagetool_urls": [fake_server_url],
+        "check_source": check_source,
+        "baseline_file": str(tmp_path / "missing-baseline.jsonl"),
+    })
+
+    with pytest.raises(PluginError, match="baseline"):
+        build(plugin, files)
+
+
+def test_persistent_containers_are_marked_as_used_on_every_rebuild(tmp_path, fake_server_url, monkeypatch):
+    monkeypatch.setattr(plugin_module, "DockerHandler", RecordingDockerHandler)
+    files = Files(create_files(str(tmp_path), {"index.md": "Some text.\n"}))
+    options = {"languagetool_urls": [fake_server_url], "docker_create_container": True, "docker_persistent": True}
+    plugin = create_plugin(options, command="serve")
+
+    build(plugin, files)
+    load_plugin_config(plugin, options)
+    build(plugin, files)
+
+    assert plugin.docker_handler.start_count == 2
+    plugin.on_shutdown()
@@ -0,0 +1,26 @@
+# local
+from mkdocs_languagetool_plugin.prose import extract_prose
+
+
+def test_footnote_definitions_are_checked():
+    prose = extract_prose("Some claim.[^1]\n\n[^1]: The footnote text is prose.\n\n[id]: https://example.com \"Title\"\n")
+
+    assert "The footnote text is prose." in prose.text
+    assert "[^1]" not in prose.text
+    assert "example.com" not in prose.text
+    assert "Title" not in prose.text
+
+
+def test_link_targets_with_parentheses_are_removed():
+    prose = extract_prose("See [the article](https://en.wikipedia.org/wiki/Python_(programming_language)) for details.\n")
+
+    assert prose.text == "See the article for details.\n"
+
+
+def test_matches_after_a_footnote_are_mapped_to_the_source():
+    text = "[^1]: A footnote with a mistkae.\n"
+    prose = extract_prose(text)
+    offset = prose.text.index("mistkae")
+    match = prose.remap_match({"offset": offset, "length": 7, "context": {"text": prose.text, "offset": offset, "length": 7}})
+
+    assert text[match["offset"]:match["offset"] + match["length"]] == "mistkae"
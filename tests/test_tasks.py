@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import time
+# pip
+import pytest
+from mkdocs.exceptions import PluginError
+# local
+from mkdocs_languagetool_plugin.async_tasks import AsyncLanguageToolTasks
+from mkdocs_languagetool_plugin.tasks import ParallelLanguageToolTasks, process_sequential_languagetool_tasks
+from mkdocs_languagetool_plugin.cache import ResultCache
+from mkdocs_languagetool_plugin.config import create_languagetool_client
+from mkdocs_languagetool_plugin.reporting import Reporter, ResultSink
+from conftest import create_plugin_config, create_files
+
+
+class SlowReporter(Reporter):
+    def add_file(self, file, results) -> None:
+        # Delay the callback before the reporter is locked, so that close() could run in between
+        time.sleep(0.05)
+        super().add_file(file, results)
+
+
+class RecordingSink(ResultSink):
+    def __init__(self):
+        self.files: list[str] = []
+        self.files_at_close: list[str] = []
+
+    def add_file(self, file, results) -> None:
+        self.files.append(file.src_uri)
+
+    def close(self) -> None:
+        self.files_at_close = list(self.files)
+
+
+@pytest.mark.parametrize("tasks_class", [ParallelLanguageToolTasks, AsyncLanguageToolTasks])
+def test_all_pages_are_reported_before_closing_with_slow_callbacks(tmp_path, fake_server_url, tasks_class):
+    plugin_config = create_plugin_config({"languagetool_urls": [fake_server_url]})
+    files = create_files(str(tmp_path), {f"page{index}.md": f"Page number {index} has some text.\n" for index in range(7)})
+    client = create_languagetool_client(plugin_config)
+    sink = RecordingSink()
+
+    tasks = tasks_class(plugin_config, client)
+    tasks.reporter = SlowReporter([sink])
+    tasks.start_parallel(files, 7)
+    tasks.wait_for_parallel()
+    client.close()
+
+    assert sorted(sink.files_at_close) == sorted(file.src_uri for file in files)
+
+
+@pytest.mark.parametrize("engine", ["sequential", "threads", "asyncio"])
+def test_reports_are_finished_when_an_error_aborts_the_build(tmp_path, engine):
+    # Nothing listens on this port, so every request fails
+    plugin_config = create_plugin_config({
+        "languagetool_urls": ["http://127.0.0.1:1/v2/check"],
+        "languagetool_max_retries": 0,
+        "report_sarif_file": str(tmp_path / "report.sarif"),
+        "report_junit_file": str(tmp_path / "report.xml"),
+    })
+    files = create_files(str(tmp_path / "docs"), {"index.md": "Some text.\n"})
+    client = create_languagetool_client(plugin_config)
+
+    with pytest.raises(PluginError, match="exit_on_error"):
+        if engine == "sequential":
+            process_sequential_languagetool_tasks(files, plugin_config, client)
+        else:
+            tasks = AsyncLanguageToolTasks(plugin_config, client) if engine == "asyncio" else ParallelLanguageToolTasks(plugin_config, client)
+            tasks.start_parallel(files, 1)
+            tasks.wait_for_parallel()
+    client.close()
+
+    with open(tmp_path / "report.sarif", encoding="utf-8") as f:
+        assert json.load(f)["runs"][0]["results"] == []
+    assert (tmp_path / "report.xml").exists()
+    assert not os.path.exists(tmp_path / "report.xml.tmp")
+
+
+def test_asyncio_checks_are_prepared_outside_of_the_event_loop(tmp_path, fake_server_url):
+    plugin_config = create_plugin_config({"languagetool_urls": [fake_server_url]})
+    files = create_files(str(tmp_path / "docs"), {"index.md": "Some text.\n"})
+    client = create_languagetool_client(plugin_config)
+    # An earlier build stored the version, so it is only checked on the first miss
+    cache = ResultCache(str(tmp_path / "cache"), 100, lambda: "6.4")
+    loops_running = []
+
+    def load_server_version() -> str:
+        # The version is requested with a blocking request on the first miss
+        try:
+            asyncio.get_running_loop()
+            loops_running.append(True)
+        except RuntimeError:
+            loops_running.append(False)
+        return "6.5"
+
+    tasks = AsyncLanguageToolTasks(plugin_config, client)
+    tasks.cache = ResultCache(cache.directory, 100, load_server_version)
+    tasks.start_parallel(files, 1)
+    tasks.wait_for_parallel()
+    client.close()
+
+    assert loops_running == [False]